@@ -0,0 +1,276 @@
+import argparse
+import json
+import os
+import time
+
+from engine import DIRECTIONS, LOST, PLAYING, WON, GameState
+from entities import KYLO_REN
+from pathfinding import UNREACHABLE, FlowField
+from replay import CHARACTERS, select
+
+# Plays the selected character toward the trophy by searching ahead
+# through the real rules: every candidate move is a GameState.step() from
+# a snapshot, so enemies answer exactly as they would in the game. Their
+# moves are deterministic, so expectimax has no chance nodes left and the
+# search is a plain depth-limited max over the player's moves, deepened
+# one ply at a time until the time budget runs out. The deepest finished
+# iteration picks the move, and a transposition table keyed by a Zobrist
+# hash of the state carries values and best moves between iterations and
+# between turns.
+
+WIN = 1000000
+LOSS = -WIN
+HIT = -100000
+# Scores at least this far from zero are decided outcomes, not estimates.
+DECIDED = 50000
+
+STEP_COST = 10
+HEALTH_VALUE = 1000
+THREAT_COST = 300
+UNREACHABLE_COST = 100000
+
+MAX_DEPTH = 64
+# Half a 60 FPS frame: single steps can run several times the average
+# node (a flow field rebuilt after a wall breaks), so plans overshoot the
+# budget by a few milliseconds even with the deadline check's margin.
+DEFAULT_BUDGET_MS = 8
+TABLE_LIMIT = 1 << 20
+
+MASK = (1 << 64) - 1
+
+def zobrist(slot, value):
+    # SplitMix64 of (slot, value): the same random-looking 64-bit key for a
+    # feature every time, without tables sized by the map.
+    z = (slot * 0x9E3779B97F4A7C15 + value * 0xBF58476D1CE4E5B9 + 0x94D049BB133111EB) & MASK
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK
+    return z ^ (z >> 31)
+
+PLAYER_SLOT = 0
+HEALTH_SLOT = 1
+WALL_SLOT = 2
+# Yoda and Luke lose different health per hit, so the same position is
+# worth different amounts to each.
+CHARACTER_SLOT = 3
+# Enemy id n uses slot ENEMY_SLOT + n.
+ENEMY_SLOT = 4
+
+def to_table(value, ply):
+    # Decided scores count plies from the root. The table keeps them
+    # counted from the node instead, so an entry stays right at whatever
+    # ply the position is reached again.
+    if value >= DECIDED:
+        return value + ply
+    if value <= -DECIDED:
+        return value - ply
+    return value
+
+def from_table(value, ply):
+    if value >= DECIDED:
+        return value - ply
+    if value <= -DECIDED:
+        return value + ply
+    return value
+
+class SearchTimeout(Exception):
+    pass
+
+class Autopilot:
+    def __init__(self, state, budget_ms=DEFAULT_BUDGET_MS, depth=None):
+        # With depth set, every plan searches exactly that deep and ignores
+        # the budget, which makes runs repeatable.
+        self.state = state
+        self.budget = budget_ms / 1000 if budget_ms else None
+        self.depth = depth
+        self.table = {}
+        self.goal_field = None
+        self.goal_walls = None
+        self.deadline = None
+        # Average cost of a node so far: a move is only started when it can
+        # finish before the deadline.
+        self.node_seconds = 0.0
+        self.nodes = 0
+        self.table_lookups = 0
+        self.table_hits = 0
+        self.search_seconds = 0.0
+        self.plans = 0
+        self.slowest_plan = 0.0
+        self.depth_reached = 0
+
+    def state_hash(self):
+        state = self.state
+        width = state.width
+        x, y = state.selected_character.get_position()
+        key = zobrist(PLAYER_SLOT, y * width + x) ^ zobrist(HEALTH_SLOT, int(state.selected_character.get_health() * 2))
+        key ^= zobrist(CHARACTER_SLOT, state.selected_character is state.luke_skywalker)
+        for enemy_id, (enemy_x, enemy_y) in enumerate(zip(state.entities.x, state.entities.y)):
+            key ^= zobrist(ENEMY_SLOT + enemy_id, enemy_y * width + enemy_x)
+        for wall_x, wall_y in state.broken_walls:
+            key ^= zobrist(WALL_SLOT, wall_y * width + wall_x)
+        return key
+
+    def evaluate(self):
+        # Shorter routes to the trophy, more health and no enemy within one
+        # move of the player are better.
+        state = self.state
+        player = state.selected_character
+        x, y = player.get_position()
+        distance = self.goal_field.distance(x, y)
+        score = player.get_health() * HEALTH_VALUE
+        score -= UNREACHABLE_COST if distance == UNREACHABLE else distance * STEP_COST
+        entities = state.entities
+        for kind, enemy_x, enemy_y in zip(entities.kind, entities.x, entities.y):
+            reach = 2 if kind == KYLO_REN else 1
+            if abs(enemy_x - x) + abs(enemy_y - y) <= reach + 1:
+                score -= THREAT_COST
+        return score
+
+    def moves(self):
+        # Moves into walls leave the player in place; only one of them is
+        # worth searching.
+        state = self.state
+        grid = state.grid
+        x, y = state.selected_character.get_position()
+        moves = []
+        stays = False
+        for direction, (nx, ny) in zip(DIRECTIONS, ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1))):
+            if 0 <= nx < state.width and 0 <= ny < state.height and grid[ny][nx] == 1:
+                moves.append(direction)
+            elif not stays:
+                stays = True
+                moves.append(direction)
+        return moves
+
+    def search(self, depth, ply):
+        if depth == 0:
+            return self.evaluate(), None
+
+        key = self.state_hash()
+        entry = self.table.get(key)
+        self.table_lookups += 1
+        best_move = None
+        if entry is not None:
+            self.table_hits += 1
+            entry_depth, entry_value, best_move = entry
+            if entry_depth >= depth:
+                return from_table(entry_value, ply), best_move
+
+        moves = self.moves()
+        if best_move in moves:
+            moves.remove(best_move)
+            moves.insert(0, best_move)
+
+        state = self.state
+        snapshot = state.snapshot()
+        best_value = None
+        try:
+            for move in moves:
+                if self.deadline is not None and time.perf_counter() + self.node_seconds > self.deadline:
+                    raise SearchTimeout()
+                result = state.step(move)
+                self.nodes += 1
+                if result.won:
+                    value = WIN - ply
+                elif result.lost:
+                    value = LOSS + ply
+                elif result.hit:
+                    value = HIT + ply + self.evaluate()
+                else:
+                    value = self.search(depth - 1, ply + 1)[0]
+                state.restore(snapshot)
+                if best_value is None or value > best_value:
+                    best_value, best_move = value, move
+        except SearchTimeout:
+            state.restore(snapshot)
+            raise
+
+        if len(self.table) >= TABLE_LIMIT:
+            self.table.clear()
+        self.table[key] = (depth, to_table(best_value, ply), best_move)
+        return best_value, best_move
+
+    def plan(self):
+        # The move to make from the current state, which is left unchanged.
+        state = self.state
+        walls = tuple(state.broken_walls)
+        if self.goal_field is None or walls != self.goal_walls:
+            self.goal_field = FlowField(state.grid, state.winning_position)
+            self.goal_walls = walls
+
+        if self.nodes:
+            self.node_seconds = self.search_seconds / self.nodes
+        start = time.perf_counter()
+        deadline = start + self.budget if self.depth is None and self.budget else None
+        # The first iteration runs without the deadline, so there is always
+        # a searched move, however small the budget.
+        self.deadline = None
+        best_move = None
+        depths = range(self.depth, self.depth + 1) if self.depth is not None else range(1, MAX_DEPTH + 1)
+        for depth in depths:
+            try:
+                value, move = self.search(depth, 0)
+            except SearchTimeout:
+                break
+            best_move = move
+            self.depth_reached = depth
+            if abs(value) >= DECIDED:
+                break
+            self.deadline = deadline
+            if deadline is not None and time.perf_counter() + self.node_seconds > deadline:
+                break
+
+        elapsed = time.perf_counter() - start
+        self.search_seconds += elapsed
+        self.slowest_plan = max(self.slowest_plan, elapsed)
+        self.plans += 1
+        return best_move
+
+    def stats(self):
+        return {
+            "plans": self.plans,
+            "nodes": self.nodes,
+            "nodes_per_s": self.nodes / self.search_seconds if self.search_seconds else 0.0,
+            "table_hit_rate": self.table_hits / self.table_lookups if self.table_lookups else 0.0,
+            "table_entries": len(self.table),
+            "mean_plan_ms": self.search_seconds / self.plans * 1000 if self.plans else 0.0,
+            "slowest_plan_ms": self.slowest_plan * 1000,
+        }
+
+def play(state, autopilot, character, max_turns):
+    state.reset()
+    select(state, character)
+    while state.status == PLAYING and state.turns < max_turns:
+        state.step(autopilot.plan())
+    return state.status
+
+def main():
+    parser = argparse.ArgumentParser(description="Let a search-based autopilot play the map headlessly.")
+    parser.add_argument("--config", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.txt"))
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--character", choices=CHARACTERS, default="luke")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="search time per move")
+    parser.add_argument("--depth", type=int, help="search exactly this deep instead, ignoring the budget")
+    parser.add_argument("--max-turns", type=int, default=500)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    state = GameState.from_config(args.config)
+    autopilot = Autopilot(state, args.budget_ms, args.depth)
+    outcomes = [play(state, autopilot, args.character, args.max_turns) for _ in range(args.games)]
+    report = dict(
+        games=args.games,
+        wins=outcomes.count(WON),
+        losses=outcomes.count(LOST),
+        timeouts=outcomes.count(PLAYING),
+        **autopilot.stats(),
+    )
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['wins']}/{report['games']} won, {report['losses']} lost, {report['timeouts']} out of turns")
+    print(f"{report['nodes']} nodes in {report['plans']} moves, {report['nodes_per_s']:.0f} nodes/s, "
+          f"table hits {report['table_hit_rate'] * 100:.1f}%")
+    print(f"plan time mean {report['mean_plan_ms']:.2f} ms, slowest {report['slowest_plan_ms']:.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+from engine import GameState, StepResult, shortest_path
+from entities import STORMTROOPER
+from pathfinding import HIERARCHICAL_MAX_ENEMIES, FlowField, FlowFieldCache, HierarchicalField, numpy
+
+# Times the hot paths on synthetic maps of growing size, wall density and
+# enemy count, writes the timings as JSON and optionally compares them with
+# a stored baseline so slowdowns show up before a release.
+
+FULL_SIZES = ((14, 11), (50, 50), (100, 100), (250, 250), (500, 500))
+QUICK_SIZES = ((14, 11), (50, 50), (100, 100))
+DENSITIES = (0.1, 0.3)
+FULL_ENEMY_COUNTS = (4, 64, 256)
+QUICK_ENEMY_COUNTS = (4, 64)
+ENEMY_KINDS = ("Stormtrooper", "Kyloren", "Darthvader")
+
+def make_map(width, height, wall_density, enemy_count, seed):
+    rng = random.Random(seed)
+    grid = [[0 if rng.random() < wall_density else 1 for _ in range(width)] for _ in range(height)]
+    player_start = (width // 2, height // 2)
+    winning_position = (width - 1, height - 1)
+    for x, y in (player_start, winning_position):
+        grid[y][x] = 1
+
+    # Spawn enemies only in the player's component so they actually chase.
+    field = FlowField(grid, player_start)
+    reachable = [(x, y) for y in range(height) for x in range(width) if field.distance(x, y) > 2]
+    spawns = [(ENEMY_KINDS[i % len(ENEMY_KINDS)], rng.choice(reachable)) for i in range(enemy_count)]
+
+    state = GameState(grid, spawns, player_start=player_start, winning_position=winning_position)
+    state.select_character(state.luke_skywalker)
+    return state
+
+def time_call(function, repeat, setup=None, number=1):
+    # Very cheap calls are timed in batches of `number` so timer resolution
+    # and scheduling noise don't dominate.
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - start) / number)
+    timings.sort()
+    return {
+        "min_ms": timings[0] * 1000,
+        "median_ms": timings[len(timings) // 2] * 1000,
+        "runs": repeat,
+    }
+
+def bench_shortest_path(state, repeat):
+    enemy_id = (state.entities.members[STORMTROOPER] or state.enemy_ids)[0]
+    start = state.enemy_position(enemy_id)
+    kind = state.enemy_kind(enemy_id)
+    goal = state.selected_character.get_position()
+    return time_call(lambda: shortest_path(state.grid, start, goal, kind), repeat)
+
+def bench_enemy_turn(state, repeat):
+    # Always the worst case for a turn: enemies at their spawns and a player
+    # cell the flow-field cache has never seen.
+    def setup():
+        state.reset_positions()
+        state.flow_fields.fields.clear()
+
+    return time_call(lambda: state.enemy_turn(StepResult()), repeat, setup)
+
+def bench_hierarchical_turn(state, repeat):
+    # Same worst case with the hierarchical pathfinder, which the game only
+    # switches to on much bigger maps. Its cluster tables are kept between
+    # runs, as they are between turns.
+    state.flow_fields = FlowFieldCache(field_class=HierarchicalField)
+
+    def setup():
+        state.reset_positions()
+        state.flow_fields.fields.clear()
+
+    return time_call(lambda: state.enemy_turn(StepResult()), repeat, setup)
+
+def bench_check_collision(state, repeat):
+    # The common case: nobody is on the player's cell.
+    player = state.selected_character
+    for y in range(state.height):
+        for x in range(state.width):
+            if state.grid[y][x] == 1 and not state.occupancy.occupied((x, y)):
+                player.set_position((x, y))
+                break
+        else:
+            continue
+        break
+    return time_call(lambda: state.check_collision(StepResult()), repeat, number=100)
+
+def bench_reset(state, repeat):
+    return time_call(state.reset_positions, repeat, number=10)
+
+def load_renderer():
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    try:
+        import game
+    except ImportError:
+        return None
+    game.pygame.init()
+    game.build_background()
+    return game
+
+def bench_draw_screen(game, state, repeat):
+    game.set_state(state)
+    player = state.selected_character
+    frames = [1]
+
+    def draw():
+        x, y = player.get_position()
+        game.draw_screen(game.pygame.Rect(x * game.GRID_SIZE, y * game.GRID_SIZE, game.CHARACTER_WIDTH, game.CHARACTER_HEIGHT))
+
+    def change_state():
+        # Alternates between two fixed layouts so every timed frame has
+        # something new to draw, without randomness between runs.
+        state.reset_positions()
+        if frames[0] % 2:
+            state.enemy_turn(StepResult())
+        frames[0] += 1
+
+    draw()
+    idle = time_call(draw, repeat, number=100)
+    after_turn = time_call(draw, repeat, change_state)
+    after_turn["blits_per_frame"] = game.renderer.last_blits
+    return {"idle": idle, "after_turn": after_turn}
+
+def run(quick=False, repeat=None, seed=0, render=True):
+    sizes = QUICK_SIZES if quick else FULL_SIZES
+    enemy_counts = QUICK_ENEMY_COUNTS if quick else FULL_ENEMY_COUNTS
+    repeat = repeat or (5 if quick else 20)
+    game = load_renderer() if render else None
+    results = []
+
+    for width, height in sizes:
+        for density in DENSITIES:
+            for enemy_count in enemy_counts:
+                case = {"width": width, "height": height, "density": density, "enemies": enemy_count}
+
+                def record(name, timing):
+                    results.append(dict(case, name=name, **timing))
+
+                record("shortest_path", bench_shortest_path(make_map(width, height, density, enemy_count, seed), repeat))
+                record("enemy_turn", bench_enemy_turn(make_map(width, height, density, enemy_count, seed), repeat))
+                if enemy_count <= HIERARCHICAL_MAX_ENEMIES:
+                    record("enemy_turn_hierarchical", bench_hierarchical_turn(make_map(width, height, density, enemy_count, seed), repeat))
+                record("check_collision", bench_check_collision(make_map(width, height, density, enemy_count, seed), repeat))
+                record("reset_positions", bench_reset(make_map(width, height, density, enemy_count, seed), repeat))
+                if game is not None:
+                    timings = bench_draw_screen(game, make_map(width, height, density, enemy_count, seed), repeat)
+                    record("draw_screen_idle", timings["idle"])
+                    record("draw_screen_after_turn", timings["after_turn"])
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": numpy.__version__ if numpy is not None else None,
+            "quick": quick,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+def result_key(result):
+    return (result["name"], result["width"], result["height"], result["density"], result["enemies"])
+
+def compare(current, baseline, tolerance, min_delta_ms):
+    # Compares the fastest run of each case, which is the least noisy, and
+    # ignores differences too small to be more than timer noise.
+    baseline_results = {result_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        previous = baseline_results.get(result_key(result))
+        if previous is None or previous["min_ms"] <= 0:
+            continue
+        ratio = result["min_ms"] / previous["min_ms"]
+        if ratio > 1 + tolerance and result["min_ms"] - previous["min_ms"] > min_delta_ms:
+            regressions.append((result_key(result), previous["min_ms"], result["min_ms"], ratio))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pathfinding, turn updates, collisions and rendering.")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="compare against this earlier results file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before a case counts as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=0.05, help="ignore slowdowns smaller than this")
+    parser.add_argument("--quick", action="store_true", help="smaller maps and fewer runs")
+    parser.add_argument("--repeat", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-render", action="store_true", help="skip draw_screen timings")
+    args = parser.parse_args()
+
+    current = run(args.quick, args.repeat, args.seed, not args.no_render)
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(current, file, indent=2)
+
+    for result in current["results"]:
+        print(f"{result['name']:<24} {result['width']:>4}x{result['height']:<4} walls={result['density']:.1f} "
+              f"enemies={result['enemies']:<4} min={result['min_ms']:.3f}ms median={result['median_ms']:.3f}ms"
+              + (f" blits={result['blits_per_frame']}" if "blits_per_frame" in result else ""))
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare(current, baseline, args.tolerance, args.min_delta_ms)
+        for key, before, after, ratio in regressions:
+            print(f"REGRESSION {key}: {before:.3f}ms -> {after:.3f}ms ({ratio:.2f}x)")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from engine import DIRECTIONS, PLAYING, GameState
+from mapfile import load_map_data
+from replay import CHARACTERS, STATUSES, select
+from server import (
+    CELL, COMMAND, DEFAULT_SOCKET, DELTA_FRAME, DELTA_HEADER, ENEMY_MOVE, ENEMY_STATE,
+    LENGTH, MOVE, START, STATE_FRAME, STATE_HEADER, STATS, STATS_HEADER,
+)
+
+# Headless load generator for server.py. Opens many sessions at once, and
+# each one plays seeded random moves in lock-step (send a move, wait for
+# its delta). Every session keeps a mirror of its game built only from the
+# frames it receives. With --verify a session also plays the same moves
+# on a local GameState and checks the mirror against it after every turn.
+
+class RemoteGame:
+    # A session's game as rebuilt from STATE and DELTA frames.
+    def __init__(self):
+        self.grid = []
+        self.player = None
+        self.health = 0
+        self.status = PLAYING
+        self.turns = 0
+        self.enemies = []
+        self.hits = 0
+
+    def apply(self, frame):
+        if frame[0] == STATE_FRAME:
+            _, width, height, x, y, health, status, self.turns, enemy_count = STATE_HEADER.unpack_from(frame)
+            offset = STATE_HEADER.size
+            self.grid = [list(frame[offset + row * width:offset + (row + 1) * width]) for row in range(height)]
+            offset += width * height
+            self.enemies = [[x, y] for _, x, y in ENEMY_STATE.iter_unpack(frame[offset:offset + enemy_count * ENEMY_STATE.size])]
+        elif frame[0] == DELTA_FRAME:
+            _, x, y, health, status, flags, self.turns, cell_count, moved_count = DELTA_HEADER.unpack_from(frame)
+            offset = DELTA_HEADER.size
+            for cell_x, cell_y, value in CELL.iter_unpack(frame[offset:offset + cell_count * CELL.size]):
+                self.grid[cell_y][cell_x] = value
+            offset += cell_count * CELL.size
+            for enemy_id, enemy_x, enemy_y in ENEMY_MOVE.iter_unpack(frame[offset:offset + moved_count * ENEMY_MOVE.size]):
+                self.enemies[enemy_id] = [enemy_x, enemy_y]
+            self.hits += flags & 1
+        else:
+            raise ValueError(f"unexpected frame kind {frame[0]}")
+        self.player = (x, y)
+        self.health = health / 2
+        self.status = STATUSES[status]
+
+    def matches(self, state):
+        entities = state.entities
+        return (
+            self.grid == state.grid
+            and self.player == state.selected_character.get_position()
+            and self.health == state.selected_character.get_health()
+            and self.status == state.status
+            and self.turns == state.turns
+            and self.enemies == [[x, y] for x, y in zip(entities.x, entities.y)]
+        )
+
+async def connect(unix_path, port):
+    if port is not None:
+        return await asyncio.open_connection("127.0.0.1", port)
+    return await asyncio.open_unix_connection(unix_path)
+
+async def request(reader, writer, command, argument=0):
+    writer.write(COMMAND.pack(command, argument))
+    (length,) = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+    return await reader.readexactly(length)
+
+async def server_stats(unix_path, port):
+    reader, writer = await connect(unix_path, port)
+    frame = await request(reader, writer, STATS)
+    writer.close()
+    await writer.wait_closed()
+    _, sessions, turns, turn_seconds, cpu_seconds = STATS_HEADER.unpack(frame)
+    return {"sessions": sessions, "turns": turns, "turn_seconds": turn_seconds, "cpu_seconds": cpu_seconds}
+
+async def play_session(index, args, map_data, latencies):
+    rng = random.Random(args.seed + index)
+    local = GameState.from_map_data(map_data) if args.verify else None
+    game = RemoteGame()
+    reader, writer = await connect(args.unix, args.port)
+
+    async def start():
+        character = rng.randrange(len(CHARACTERS))
+        game.apply(await request(reader, writer, START, character))
+        if local is not None:
+            local.reset()
+            select(local, CHARACTERS[character])
+
+    await start()
+    for _ in range(args.turns):
+        if game.status != PLAYING:
+            await start()
+        direction = rng.randrange(len(DIRECTIONS))
+        sent = time.perf_counter()
+        game.apply(await request(reader, writer, MOVE, direction))
+        latencies.append(time.perf_counter() - sent)
+        if local is not None:
+            local.step(DIRECTIONS[direction])
+            if not game.matches(local):
+                raise RuntimeError(f"session {index}: the mirrored game differs from the local one at turn {local.turns}")
+    writer.close()
+    await writer.wait_closed()
+
+async def run(args, map_data):
+    before = await server_stats(args.unix, args.port)
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(play_session(index, args, map_data, latencies) for index in range(args.sessions)))
+    elapsed = time.perf_counter() - start
+    after = await server_stats(args.unix, args.port)
+
+    turns = after["turns"] - before["turns"]
+    turn_seconds = (after["turn_seconds"] - before["turn_seconds"]) / turns
+    cpu_seconds = (after["cpu_seconds"] - before["cpu_seconds"]) / turns
+    latencies.sort()
+    return {
+        "sessions": args.sessions,
+        "turns": turns,
+        "elapsed_s": elapsed,
+        "turns_per_s": turns / elapsed,
+        "latency_p50_ms": latencies[len(latencies) // 2] * 1000,
+        "latency_p99_ms": latencies[len(latencies) * 99 // 100] * 1000,
+        "turn_logic_us": turn_seconds * 1e6,
+        "server_cpu_us": cpu_seconds * 1e6,
+        # How many sessions one core keeps up with when every player makes
+        # `rate` moves a second: counting the rules alone, and counting
+        # everything the server process does (socket I/O, framing).
+        "moves_per_second": args.rate,
+        "sessions_per_core_turn_logic": 1 / (turn_seconds * args.rate),
+        "sessions_per_core_server": 1 / (cpu_seconds * args.rate),
+        "verified": args.verify,
+    }
+
+def spawn_server(args):
+    server_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py")
+    command = [sys.executable, server_path, "--config", args.config]
+    command += ["--port", str(args.port)] if args.port is not None else ["--unix", args.unix]
+    process = subprocess.Popen(command)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            asyncio.run(server_stats(args.unix, args.port))
+            return process
+        except OSError:
+            time.sleep(0.05)
+    process.terminate()
+    raise SystemExit("the server did not start")
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive many concurrent sessions on server.py and report how many a core sustains.")
+    parser.add_argument("--config", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.txt"))
+    parser.add_argument("--unix", default=DEFAULT_SOCKET, metavar="PATH")
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--spawn", action="store_true", help="start a server for the run and stop it afterwards")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=200, help="moves per session")
+    parser.add_argument("--rate", type=float, default=5, help="moves per second a player makes, for the sessions-per-core estimate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verify", action="store_true", help="check every delta against a local copy of the game")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+    if args.spawn and args.port is None:
+        args.unix = os.path.join(tempfile.mkdtemp(), "swpacman.sock")
+
+    map_data = load_map_data(args.config)
+    process = spawn_server(args) if args.spawn else None
+    try:
+        report = asyncio.run(run(args, map_data))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['sessions']} sessions, {report['turns']} turns in {report['elapsed_s']:.2f} s ({report['turns_per_s']:.0f} turns/s)"
+          + (", every delta verified" if report["verified"] else ""))
+    print(f"latency p50 {report['latency_p50_ms']:.2f} ms, p99 {report['latency_p99_ms']:.2f} ms")
+    print(f"server per turn: {report['turn_logic_us']:.0f} us of rules, {report['server_cpu_us']:.0f} us of CPU in total")
+    print(f"sessions per core at {report['moves_per_second']:g} moves/s: {report['sessions_per_core_turn_logic']:.0f} (rules only), "
+          f"{report['sessions_per_core_server']:.0f} (whole server)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import time
+
+from autopilot import Autopilot
+from engine import DIRECTIONS, PLAYING, WON, GameState
+from entities import KIND_NAMES, KYLO_REN
+from pathfinding import FlowField
+
+# Plays many headless games per config to estimate how hard it is. Every
+# game gets its own seed (base seed + game index), so results are the same
+# no matter how many worker processes share the work.
+
+MOVES = {
+    "left": (-1, 0),
+    "right": (1, 0),
+    "up": (0, -1),
+    "down": (0, 1),
+}
+
+def random_policy(state, rng, goal_field):
+    return rng.choice(DIRECTIONS)
+
+def greedy_policy(state, rng, goal_field):
+    # Walks the shortest route to the trophy and ignores the enemies.
+    x, y = state.selected_character.get_position()
+    next_x, next_y = goal_field.next_step(x, y)
+    for direction, (dx, dy) in MOVES.items():
+        if (x + dx, y + dy) == (next_x, next_y):
+            return direction
+    return rng.choice(DIRECTIONS)
+
+def cautious_policy(state, rng, goal_field):
+    # Like greedy, but prefers moves that keep out of reach of every enemy
+    # and falls back to a random move when boxed in.
+    x, y = state.selected_character.get_position()
+    threatened = set()
+    entities = state.entities
+    for kind, enemy_x, enemy_y in zip(entities.kind, entities.x, entities.y):
+        reach = 2 if kind == KYLO_REN else 1
+        for dy in range(-reach, reach + 1):
+            for dx in range(-reach + abs(dy), reach - abs(dy) + 1):
+                threatened.add((enemy_x + dx, enemy_y + dy))
+
+    options = []
+    for direction, (dx, dy) in MOVES.items():
+        nx, ny = x + dx, y + dy
+        if 0 <= nx < state.width and 0 <= ny < state.height and state.grid[ny][nx] == 1:
+            distance = goal_field.distance(nx, ny)
+            if distance >= 0 and (nx, ny) not in threatened:
+                options.append((distance, rng.random(), direction))
+    if options:
+        return min(options)[2]
+    return rng.choice(DIRECTIONS)
+
+# The autopilot searches a fixed depth here instead of using a time budget,
+# and starts every game with an empty transposition table, so results don't
+# depend on the machine or on which games a worker played before.
+SEARCH_DEPTH = 6
+worker_autopilot = None
+
+def search_policy(state, rng, goal_field):
+    global worker_autopilot
+    if worker_autopilot is None or worker_autopilot.state is not state or state.turns == 0:
+        worker_autopilot = Autopilot(state, depth=SEARCH_DEPTH)
+    return worker_autopilot.plan()
+
+POLICIES = {
+    "random": random_policy,
+    "greedy": greedy_policy,
+    "cautious": cautious_policy,
+    "search": search_policy,
+}
+
+worker_state = None
+
+def init_worker(config_path):
+    global worker_state
+    worker_state = GameState.from_config(config_path)
+
+def play_games(args):
+    first_game, game_count, seed, policy_name, character_name, max_turns = args
+    state = worker_state
+    policy = POLICIES[policy_name]
+    summary = new_summary()
+
+    for game in range(first_game, first_game + game_count):
+        rng = random.Random(seed + game)
+        state.reset()
+        player = state.master_yoda if character_name == "yoda" else state.luke_skywalker
+        state.select_character(player)
+        goal_field = FlowField(state.original_grid, state.winning_position)
+
+        while state.status == PLAYING and state.turns < max_turns:
+            health = player.get_health()
+            result = state.step(policy(state, rng, goal_field))
+            if result.hit:
+                kind = KIND_NAMES[state.enemy_kind(result.hit_by)]
+                summary["health_lost"][kind] = summary["health_lost"].get(kind, 0) + health - player.get_health()
+            if result.opened_cells or result.restored_cells:
+                goal_field = FlowField(state.grid, state.winning_position)
+
+        summary["games"] += 1
+        summary["turns"] += state.turns
+        if state.status == WON:
+            summary["wins"] += 1
+        elif state.status == PLAYING:
+            summary["timeouts"] += 1
+    return summary
+
+def new_summary():
+    return {"games": 0, "wins": 0, "timeouts": 0, "turns": 0, "health_lost": {}}
+
+def merge_summaries(total, summary):
+    for key in ("games", "wins", "timeouts", "turns"):
+        total[key] += summary[key]
+    for kind, lost in summary["health_lost"].items():
+        total["health_lost"][kind] = total["health_lost"].get(kind, 0) + lost
+
+def evaluate(config_path, games, seed=0, policy="random", character="luke", max_turns=500, workers=None, chunk_size=50):
+    workers = workers or os.cpu_count() or 1
+    chunks = [
+        (first, min(chunk_size, games - first), seed, policy, character, max_turns)
+        for first in range(0, games, chunk_size)
+    ]
+    total = new_summary()
+    if workers == 1:
+        init_worker(config_path)
+        for chunk in chunks:
+            merge_summaries(total, play_games(chunk))
+    else:
+        with multiprocessing.Pool(workers, initializer=init_worker, initargs=(config_path,)) as pool:
+            for summary in pool.imap_unordered(play_games, chunks):
+                merge_summaries(total, summary)
+    return total
+
+def report(total, elapsed):
+    games = total["games"]
+    return {
+        "games": games,
+        "win_rate": total["wins"] / games if games else 0.0,
+        "timeout_rate": total["timeouts"] / games if games else 0.0,
+        "mean_turns": total["turns"] / games if games else 0.0,
+        "health_lost_per_game": {kind: lost / games for kind, lost in sorted(total["health_lost"].items())},
+        "games_per_second": games / elapsed if elapsed else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate how difficult a config.txt map is by playing it headlessly.")
+    parser.add_argument("config", nargs="?", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.txt"))
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="random")
+    parser.add_argument("--character", choices=("yoda", "luke"), default="luke")
+    parser.add_argument("--max-turns", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    total = evaluate(args.config, args.games, args.seed, args.policy, args.character, args.max_turns, args.workers)
+    result = report(total, time.perf_counter() - start)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"games:           {result['games']}")
+    print(f"win rate:        {result['win_rate']:.1%}")
+    print(f"timeouts:        {result['timeout_rate']:.1%}")
+    print(f"mean turns:      {result['mean_turns']:.1f}")
+    for kind, lost in result["health_lost_per_game"].items():
+        print(f"health lost/game to {kind}: {lost:.2f}")
+    print(f"games/second:    {result['games_per_second']:.0f}")
+
+if __name__ == "__main__":
+    main()
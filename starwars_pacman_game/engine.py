@@ -0,0 +1,446 @@
+from entities import DARTH_VADER, KINDS, KYLO_REN, STORMTROOPER, EntityStore
+from mapfile import DOOR_POSITIONS, PLAYER_START, WINNING_POSITION, load_map_data
+from nexthop import load_table
+from occupancy import OccupancyIndex
+from pathfinding import FlowField, FlowFieldCache, default_field_class, next_steps_array, numpy
+from profiler import profiler
+from snapshot import LUKE, NO_CHARACTER, YODA, Snapshot, broken_walls_in, pack_grid
+
+# Game rules without any pygame dependency. game.py draws a GameState and
+# feeds it key presses; tools and servers can drive it directly.
+
+START_HEALTH = 3
+
+DIRECTIONS = ("left", "right", "up", "down")
+
+PLAYING = "playing"
+WON = "won"
+LOST = "lost"
+# Numbered in this order in recordings, saved games and server frames.
+STATUSES = (PLAYING, WON, LOST)
+
+# From this many enemies on, turns move them with NumPy array operations
+# (when NumPy is installed) instead of one at a time.
+BATCH_MIN_ENEMIES = 1000
+
+class Location:
+    def __init__(self, char_x, char_y):
+        self.char_x = char_x
+        self.char_y = char_y
+
+    def set_x(self, new_x):
+        self.char_x = new_x
+    
+    def set_y(self, new_y):
+        self.char_y = new_y
+        
+    def get_x(self):
+        return self.char_x
+    
+    def get_y(self):
+        return self.char_y
+
+class Character:
+    def __init__(self, name, type_, location):
+        self.name = name
+        self.type_ = type_
+        self.location = location
+
+    def move(self, direction, grid):
+        new_x, new_y = self.location.char_x, self.location.char_y
+        if direction == "left" and new_x > 0 and grid[new_y][new_x - 1] == 1:
+            new_x -= 1
+        elif direction == "right" and new_x < len(grid[0]) - 1 and grid[new_y][new_x + 1] == 1:
+            new_x += 1
+        elif direction == "up" and new_y > 0 and grid[new_y - 1][new_x] == 1:
+            new_y -= 1
+        elif direction == "down" and new_y < len(grid) - 1 and grid[new_y + 1][new_x] == 1:
+            new_y += 1
+        self.location.set_x(new_x)
+        self.location.set_y(new_y)
+
+    def get_name(self):
+        return self.name
+    
+    def set_name(self, new_name):
+        self.name = new_name
+
+    def get_type(self):
+        return self.type_
+    
+    def set_type(self, new_type):
+        self.type_ = new_type
+
+    def get_position(self):
+        return self.location.get_x(), self.location.get_y()
+    
+    def set_position(self, new_position):
+        self.location.set_x(new_position[0])
+        self.location.set_y(new_position[1])
+
+    def show_info(self):
+        return f"Character Name: {self.name}, Type: {self.type_}, Position: {self.get_position()}"
+
+class MasterYoda(Character):
+    def __init__(self, name, type_, location, health):
+        super().__init__(name, type_, location)
+        self.health = health
+
+    def decrease_health(self):
+        self.health = max(self.health - 0.5, 0)
+
+    def set_health(self, new_health):
+        self.health = new_health
+
+    def get_health(self):
+        return self.health
+
+class LukeSkywalker(Character):
+    def __init__(self, name, type_, location, health):
+        super().__init__(name, type_, location)
+        self.health = health
+
+    def decrease_health(self):
+        self.health = max(self.health - 1, 0)
+
+    def set_health(self, new_health):
+        self.health = new_health
+
+    def get_health(self):
+        return self.health
+
+def shortest_path(grid, start, goal, kind, flow_fields=None, inside=None):
+    # Darth Vader walks straight through walls; everyone else follows the
+    # wall-respecting field.
+    if kind == DARTH_VADER:
+        return FlowField(grid, goal, ignore_walls=True).path_from(*start, inside)
+    if flow_fields is None:
+        return FlowField(grid, goal).path_from(*start, inside)
+    return flow_fields.get(grid, goal).path_from(*start, inside)
+
+class StepResult:
+    def __init__(self):
+        self.hit = False
+        # Id of the enemy that caught the player.
+        self.hit_by = None
+        self.won = False
+        self.lost = False
+        self.opened_cells = []
+        self.restored_cells = []
+
+class GameState:
+    def __init__(self, grid, enemy_spawns, player_start=PLAYER_START, winning_position=WINNING_POSITION, doors=DOOR_POSITIONS, share_grid=False):
+        # The original grid is never written to. The live grid starts out
+        # as the same row lists and a row is copied the first time a wall in
+        # it breaks (see break_wall), which is logged in broken_walls; a
+        # reset puts the original rows back for just the logged cells. With
+        # share_grid the caller's rows are used as the original directly,
+        # e.g. one MapData's for every server session.
+        self.original_grid = grid if share_grid else [row[:] for row in grid]
+        self.grid = list(self.original_grid)
+        self.broken_walls = []
+        self._original_cells = None
+        self.width = len(grid[0])
+        self.height = len(grid)
+        self.player_start = player_start
+        self.winning_position = winning_position
+        self.doors = dict(doors)
+        # Hash of the config the state was loaded from (see from_config).
+        self.map_hash = None
+        self.flow_fields = FlowFieldCache(field_class=default_field_class(self.width, self.height, len(enemy_spawns)))
+
+        self.master_yoda = MasterYoda("Master Yoda", "good", Location(*player_start), START_HEALTH)
+        self.luke_skywalker = LukeSkywalker("Luke Skywalker", "good", Location(*player_start), START_HEALTH)
+        self.selected_character = None
+
+        self.entities = EntityStore()
+        self.occupancy = OccupancyIndex(self.width, self.height)
+
+        for character_info, (door_x, door_y) in enemy_spawns:
+            self.add_enemy(character_info, door_x, door_y)
+
+        self.status = PLAYING
+        self.turns = 0
+        # Bumped whenever positions or the grid change, so renderers can
+        # tell when cached drawing is stale.
+        self.version = 0
+
+    @classmethod
+    def from_config(cls, config_path):
+        map_data = load_map_data(config_path)
+        state = cls.from_map_data(map_data)
+        if map_data.grid_array is not None and state.flow_fields.field_class.uses_grid_array:
+            state.flow_fields.grid_array = map_data.grid_array
+        # Without Vaders the walls never change, so a precomputed next-hop
+        # table (see nexthop.py) can answer every enemy move.
+        if not state.entities.members[DARTH_VADER]:
+            state.flow_fields.next_hops = load_table(config_path, map_data.digest)
+        return state
+
+    @classmethod
+    def from_map_data(cls, map_data, next_hops=None):
+        # Many states can share one MapData: its grid rows (as their
+        # original grid) and its read-only next-hop table.
+        state = cls(map_data.grid, map_data.spawns, map_data.player_start, map_data.winning_position, map_data.doors, share_grid=True)
+        state.map_hash = map_data.digest
+        if not state.entities.members[DARTH_VADER]:
+            state.flow_fields.next_hops = next_hops
+        return state
+
+    @property
+    def enemy_ids(self):
+        return self.entities.ordered_ids()
+
+    def add_enemy(self, character_info, door_x, door_y):
+        kind = KINDS.get(character_info)
+        if kind is None:
+            return None
+        enemy_id = self.entities.add(kind, door_x, door_y)
+        self.occupancy.add(enemy_id, (door_x, door_y))
+        return enemy_id
+
+    def enemy_position(self, enemy_id):
+        return self.entities.position(enemy_id)
+
+    def enemy_kind(self, enemy_id):
+        return self.entities.kind[enemy_id]
+
+    def select_character(self, character):
+        self.selected_character = character
+        self.status = PLAYING
+        self.version += 1
+
+    def enemy_path(self, enemy_id, inside=None):
+        return shortest_path(self.grid, self.entities.position(enemy_id), self.selected_character.get_position(), self.entities.kind[enemy_id], self.flow_fields, inside)
+
+    def step(self, action):
+        # One turn: the player moves (or bumps into a wall), then every
+        # enemy moves once. Collisions are checked on both sides of the
+        # enemy turn, like the per-frame check the game loop used to do.
+        result = StepResult()
+        if self.status != PLAYING:
+            return result
+
+        player = self.selected_character
+        player_from = player.get_position()
+        self.occupancy.begin_turn()
+        if action is not None:
+            player.move(action, self.grid)
+        self.turns += 1
+        self.version += 1
+
+        if player.get_position() == self.winning_position:
+            self.status = WON
+            result.won = True
+            return result
+
+        start = profiler.start()
+        hit = self.check_collision(result)
+        profiler.stop("collision", start)
+        if not hit:
+            start = profiler.start()
+            self.enemy_turn(result)
+            profiler.stop("pathfinding", start)
+            start = profiler.start()
+            self.check_collision(result, player_from)
+            profiler.stop("collision", start)
+        return result
+
+    def break_wall(self, x, y):
+        self._open_wall(x, y)
+        self.flow_fields.open_cell(self.grid, x, y)
+
+    def _open_wall(self, x, y):
+        row = self.grid[y]
+        if row is self.original_grid[y]:
+            row = self.grid[y] = row[:]
+        row[x] = 1
+        self.broken_walls.append((x, y))
+
+    def revert_walls(self):
+        # Back to the original rows, in time proportional to the number of
+        # broken walls; the caller repairs the flow fields.
+        grid, original_grid = self.grid, self.original_grid
+        for x, y in self.broken_walls:
+            grid[y] = original_grid[y]
+        self.broken_walls = []
+
+    @property
+    def original_cells(self):
+        # The original grid packed like a snapshot's; only needed to save
+        # or load one.
+        if self._original_cells is None:
+            self._original_cells = pack_grid(self.original_grid)
+        return self._original_cells
+
+    def enemy_turn(self, result):
+        # One field per movement rule, shared by every enemy this turn.
+        grid = self.grid
+        target = self.selected_character.get_position()
+        walker_field = self.flow_fields.get(grid, target)
+        vader_field = FlowField(grid, target, ignore_walls=True)
+
+        if numpy is not None and len(self.entities) >= BATCH_MIN_ENEMIES:
+            self.enemy_turn_batch(walker_field, vader_field, result)
+            return
+
+        entities, occupancy = self.entities, self.occupancy
+        xs, ys = entities.x, entities.y
+
+        # Chasing enemies bunch up on the same cells, so each cell's next
+        # step is looked up once per kind and turn.
+        for kind, steps in ((STORMTROOPER, 1), (KYLO_REN, 2)):
+            moves = {}
+            for i in entities.members[kind]:
+                position = (xs[i], ys[i])
+                new_position = moves.get(position)
+                if new_position is None:
+                    new_position = moves[position] = walker_field.next_step(*position, steps=steps)
+                if new_position != position:
+                    xs[i], ys[i] = new_position
+                    occupancy.move(i, position, new_position)
+
+        for i in entities.members[DARTH_VADER]:
+            position = (xs[i], ys[i])
+            current_x, current_y = vader_field.next_step(*position)
+            xs[i], ys[i] = current_x, current_y
+            occupancy.move(i, position, (current_x, current_y))
+            if grid[current_y][current_x] == 0:
+                self.break_wall(current_x, current_y)
+                result.opened_cells.append((current_x, current_y))
+
+    def enemy_turn_batch(self, walker_field, vader_field, result):
+        # Same moves as the loop in enemy_turn, computed per kind over the
+        # position arrays. Walls are opened afterwards in Vader id order,
+        # which is the order the loop would have opened them in.
+        grid, entities = self.grid, self.entities
+        xs = numpy.frombuffer(entities.x, dtype=numpy.intc)
+        ys = numpy.frombuffer(entities.y, dtype=numpy.intc)
+        old_cells = ys.astype(numpy.int64) * self.width + xs
+
+        for kind, field, steps in ((STORMTROOPER, walker_field, 1), (KYLO_REN, walker_field, 2), (DARTH_VADER, vader_field, 1)):
+            ids = numpy.frombuffer(entities.members[kind], dtype=numpy.intc)
+            if ids.size:
+                xs[ids], ys[ids] = next_steps_array(field, xs[ids], ys[ids], steps)
+
+        vader_ids = numpy.frombuffer(entities.members[DARTH_VADER], dtype=numpy.intc)
+        for current_x, current_y in zip(xs[vader_ids].tolist(), ys[vader_ids].tolist()):
+            if grid[current_y][current_x] == 0:
+                self.break_wall(current_x, current_y)
+                result.opened_cells.append((current_x, current_y))
+
+        self.occupancy.move_all(old_cells, ys.astype(numpy.int64) * self.width + xs)
+
+    def _relink_enemies(self, old_x, old_y):
+        # Re-files every enemy in the occupancy index after its position
+        # arrays were overwritten, touching only the cells enemies left and
+        # entered.
+        entities = self.entities
+        if numpy is not None and len(entities) >= BATCH_MIN_ENEMIES:
+            old_cells = numpy.frombuffer(old_y, dtype=numpy.intc).astype(numpy.int64) * self.width + numpy.frombuffer(old_x, dtype=numpy.intc)
+            cells = numpy.frombuffer(entities.y, dtype=numpy.intc).astype(numpy.int64) * self.width + numpy.frombuffer(entities.x, dtype=numpy.intc)
+            self.occupancy.move_all(old_cells, cells)
+            self.occupancy.begin_turn()
+        else:
+            self.occupancy.relink(old_x, old_y, entities.x, entities.y)
+
+    def check_collision(self, result, player_from=None):
+        # An enemy on the player's cell, or, when player_from is given, one
+        # that swapped cells with the player during this turn. With several
+        # hits the one reported is the first in enemy_ids order.
+        player = self.selected_character
+        position = player.get_position()
+        hits = self.occupancy.at(position)
+        if player_from is not None and player_from != position:
+            hits.extend(self.occupancy.crossed(player_from, position))
+        if not hits:
+            return False
+
+        kinds = self.entities.kind
+        player.decrease_health()
+        result.hit = True
+        result.hit_by = min(hits, key=lambda enemy_id: (kinds[enemy_id], enemy_id))
+        result.restored_cells.extend(self.reset_positions())
+        if player.get_health() <= 0:
+            self.status = LOST
+            result.lost = True
+        return True
+
+    def reset_positions(self):
+        # Puts the grid and every character back where the round started;
+        # returns the cells whose wall state was restored.
+        self.revert_walls()
+        restored_cells = self.flow_fields.restore(self.grid)
+
+        entities = self.entities
+        old_x, old_y = entities.x[:], entities.y[:]
+        entities.reset()
+        self._relink_enemies(old_x, old_y)
+
+        if self.selected_character is not None:
+            self.selected_character.set_position(self.player_start)
+
+        self.version += 1
+        return restored_cells
+
+    def snapshot(self):
+        players = tuple((*player.get_position(), player.get_health()) for player in (self.master_yoda, self.luke_skywalker))
+        if self.selected_character is None:
+            selected = NO_CHARACTER
+        else:
+            selected = YODA if self.selected_character is self.master_yoda else LUKE
+        return Snapshot(
+            self.map_hash, self.width, self.height, None, self.entities.x[:], self.entities.y[:],
+            players, selected, STATUSES.index(self.status), self.turns,
+            broken_walls=tuple(self.broken_walls), original_grid=self.original_grid,
+        )
+
+    def restore(self, snapshot):
+        # Puts the game back as it was when the snapshot was taken and
+        # returns the cells whose wall state changed. Cached fields are
+        # repaired for those cells, like after a reset.
+        if (snapshot.width, snapshot.height, len(snapshot.enemy_x)) != (self.width, self.height, len(self.entities)):
+            raise ValueError("the snapshot is of a different map")
+        if self.map_hash is not None and snapshot.map_hash is not None and snapshot.map_hash != self.map_hash:
+            raise ValueError("the snapshot was taken on a different config.txt")
+        if snapshot.status >= len(STATUSES):
+            raise ValueError(f"unknown status {snapshot.status}")
+
+        walls = snapshot.broken_walls
+        if walls is None:
+            walls = snapshot.broken_walls = broken_walls_in(self.original_cells, snapshot.cells, self.width)
+        previous, target = set(self.broken_walls), set(walls)
+        changed = [cell for cell in self.broken_walls if cell not in target] + [cell for cell in walls if cell not in previous]
+        if changed:
+            self.revert_walls()
+            for x, y in walls:
+                self._open_wall(x, y)
+            self.flow_fields.restore(self.grid)
+            for x, y in walls:
+                if (x, y) not in previous:
+                    self.flow_fields.open_cell(self.grid, x, y)
+
+        entities = self.entities
+        old_x, old_y = entities.x[:], entities.y[:]
+        entities.x[:] = snapshot.enemy_x
+        entities.y[:] = snapshot.enemy_y
+        self._relink_enemies(old_x, old_y)
+
+        for player, (x, y, health) in zip((self.master_yoda, self.luke_skywalker), snapshot.players):
+            player.set_position((x, y))
+            player.set_health(health)
+        self.selected_character = (None, self.master_yoda, self.luke_skywalker)[snapshot.selected]
+        self.status = STATUSES[snapshot.status]
+        self.turns = snapshot.turns
+        self.version += 1
+        return changed
+
+    def reset(self):
+        restored_cells = self.reset_positions()
+        for player in (self.master_yoda, self.luke_skywalker):
+            player.set_position(self.player_start)
+            player.set_health(START_HEALTH)
+        self.selected_character = None
+        self.status = PLAYING
+        self.turns = 0
+        return restored_cells
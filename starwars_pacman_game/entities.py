@@ -0,0 +1,60 @@
+from array import array
+
+# Enemies are stored as parallel typed arrays indexed by entity id instead
+# of one object per enemy, so each costs a few bytes and whole-population
+# operations (like sending everyone back to spawn) are bulk array copies.
+
+# Kinds are numbered in the order enemies have always been drawn and
+# checked for collisions: stormtroopers, Kylo Rens, Darth Vaders.
+STORMTROOPER = 0
+KYLO_REN = 1
+DARTH_VADER = 2
+
+# Names as written in config.txt.
+KINDS = {
+    "Stormtrooper": STORMTROOPER,
+    "Kyloren": KYLO_REN,
+    "Darthvader": DARTH_VADER,
+}
+
+# Names used in reports.
+KIND_NAMES = ("Stormtrooper", "KyloRen", "DarthVader")
+
+class EntityStore:
+    def __init__(self):
+        self.kind = array("B")
+        self.x = array("i")
+        self.y = array("i")
+        self.spawn_x = array("i")
+        self.spawn_y = array("i")
+        # Ids of each kind, in the order they were added.
+        self.members = (array("i"), array("i"), array("i"))
+
+    def __len__(self):
+        return len(self.kind)
+
+    def add(self, kind, x, y):
+        entity_id = len(self.kind)
+        self.kind.append(kind)
+        self.x.append(x)
+        self.y.append(y)
+        self.spawn_x.append(x)
+        self.spawn_y.append(y)
+        self.members[kind].append(entity_id)
+        return entity_id
+
+    def position(self, entity_id):
+        return self.x[entity_id], self.y[entity_id]
+
+    def set_position(self, entity_id, position):
+        self.x[entity_id], self.y[entity_id] = position
+
+    def spawn(self, entity_id):
+        return self.spawn_x[entity_id], self.spawn_y[entity_id]
+
+    def ordered_ids(self):
+        return [*self.members[STORMTROOPER], *self.members[KYLO_REN], *self.members[DARTH_VADER]]
+
+    def reset(self):
+        self.x[:] = self.spawn_x
+        self.y[:] = self.spawn_y
@@ -1,686 +1,760 @@
-import pygame
-import os
-import sys
-from collections import deque
-
-SCREEN_WIDTH = 1920
-SCREEN_HEIGHT = 1020
-
-SCREEN = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Star Wars")
-
-if getattr(sys, 'frozen', False):
-    current_dir = sys._MEIPASS
-else:
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-
-config_path = os.path.join(current_dir, "config.txt")
-assets_path = os.path.join(current_dir, "Assets")
-click_sound_path = os.path.join(current_dir, "click.mp3")
-effect_sound_path = os.path.join(current_dir, "effect.mp3")
-music_path = os.path.join(current_dir, "music.mp3")
-victory_sound_path = os.path.join(current_dir, "victory.mp3")
-icon_path = os.path.join(current_dir, "icon.png")
-icon = pygame.image.load(icon_path)
-pygame.display.set_icon(icon)
-
-FPS = 60
-
-def load_map(config_path):
-    grid = []
-    with open(config_path, 'r', encoding='utf-8') as file:
-        for line in file:
-            if not line.strip().startswith('Character') and not line.strip().startswith('Door') and line.strip():
-                grid.append([int(x) for x in line.strip().split('\t')])
-    return grid
-
-grid = load_map(config_path)
-
-GRID_SIZE = 50
-GRID_WIDTH = len(grid[0])
-GRID_HEIGHT = len(grid)
-
-CHARACTER_WIDTH = GRID_SIZE
-CHARACTER_HEIGHT = GRID_SIZE
-
-class Location:
-    def __init__(self, char_x, char_y):
-        self.char_x = char_x
-        self.char_y = char_y
-
-    def set_x(self, new_x):
-        self.char_x = new_x
-    
-    def set_y(self, new_y):
-        self.char_y = new_y
-        
-    def get_x(self):
-        return self.char_x
-    
-    def get_y(self):
-        return self.char_y
-
-class Character:
-    def __init__(self, name, type_, location):
-        self.name = name
-        self.type_ = type_
-        self.location = location
-
-    def move(self, direction, grid):
-        new_x, new_y = self.location.char_x, self.location.char_y
-        if direction == "left" and new_x > 0 and grid[new_y][new_x - 1] == 1:
-            new_x -= 1
-        elif direction == "right" and new_x < GRID_WIDTH - 1 and grid[new_y][new_x + 1] == 1:
-            new_x += 1
-        elif direction == "up" and new_y > 0 and grid[new_y - 1][new_x] == 1:
-            new_y -= 1
-        elif direction == "down" and new_y < GRID_HEIGHT - 1 and grid[new_y + 1][new_x] == 1:
-            new_y += 1
-        self.location.set_x(new_x)
-        self.location.set_y(new_y)
-
-    def get_name(self):
-        return self.name
-    
-    def set_name(self, new_name):
-        self.name = new_name
-
-    def get_type(self):
-        return self.type_
-    
-    def set_type(self, new_type):
-        self.type_ = new_type
-
-    def get_position(self):
-        return self.location.get_x(), self.location.get_y()
-    
-    def set_position(self, new_position):
-        self.location.set_x(new_position[0])
-        self.location.set_y(new_position[1])
-
-    def show_info(self):
-        return f"Character Name: {self.name}, Type: {self.type_}, Position: {self.get_position()}"
-
-class MasterYoda(Character):
-    def __init__(self, name, type_, location, health):
-        super().__init__(name, type_, location)
-        self.health = health
-
-    def decrease_health(self):
-        self.health = max(self.health - 0.5, 0)
-
-    def set_health(self, new_health):
-        self.health = new_health
-
-    def get_health(self):
-        return self.health
-
-class LukeSkywalker(Character):
-    def __init__(self, name, type_, location, health):
-        super().__init__(name, type_, location)
-        self.health = health
-
-    def decrease_health(self):
-        self.health = max(self.health - 1, 0)
-
-    def set_health(self, new_health):
-        self.health = new_health
-
-    def get_health(self):
-        return self.health
-
-class DarthVader(Character):
-    def __init__(self, name, type_, location):
-        super().__init__(name, type_, location)
-
-    def shortest_path(self, target, grid):
-        def bfs(start, goal):
-            queue = deque([start])
-            visited = set()
-            parents = {start: None}
-
-            while queue:
-                current = queue.popleft()
-                visited.add(current)
-
-                if current == goal:
-                    path = []
-                    while current:
-                        path.append(current)
-                        current = parents[current]
-                    return path[::-1]
-
-                x, y = current
-                neighbors = [
-                    (x - 1, y), (x + 1, y),
-                    (x, y - 1), (x, y + 1) 
-                ]
-
-                for nx, ny in neighbors:
-                    if 0 <= nx < GRID_WIDTH and 0 <= ny < GRID_HEIGHT and (nx, ny) not in visited:
-                        parents[(nx, ny)] = current
-                        queue.append((nx, ny))
-            return []
-
-        start = (self.location.char_x, self.location.char_y)
-        goal = (target.location.char_x, target.location.char_y)
-
-        return bfs(start, goal)
-
-class KyloRen(Character):
-    def __init__(self, name, type_, location):
-        super().__init__(name, type_, location)
-
-    def shortest_path(self, target, grid):
-        def bfs(start, goal):
-            queue = deque([start])
-            visited = set()
-            parents = {start: None}
-
-            while queue:
-                current = queue.popleft()
-                visited.add(current)
-
-                if current == goal:
-                    path = []
-                    while current:
-                        path.append(current)
-                        current = parents[current]
-                    return path[::-1]
-
-                x, y = current
-                neighbors = [
-                    (x - 1, y), (x + 1, y),
-                    (x, y - 1), (x, y + 1)
-                ]
-
-                for nx, ny in neighbors:
-                    if 0 <= nx < GRID_WIDTH and 0 <= ny < GRID_HEIGHT and grid[ny][nx] == 1 and (nx, ny) not in visited:
-                        parents[(nx, ny)] = current
-                        queue.append((nx, ny))
-            return []
-
-        start = (self.location.char_x, self.location.char_y)
-        goal = (target.location.char_x, target.location.char_y)
-        return bfs(start, goal)
-
-class Stormtrooper(Character):
-    def __init__(self, name, type_, location):
-        super().__init__(name, type_, location)
-
-    def shortest_path(self, target, grid):
-        def bfs(start, goal):
-            queue = deque([start])
-            visited = set()
-            parents = {start: None}
-
-            while queue:
-                current = queue.popleft()
-                visited.add(current)
-
-                if current == goal:
-                    path = []
-                    while current:
-                        path.append(current)
-                        current = parents[current]
-                    return path[::-1]
-
-                x, y = current
-                neighbors = [
-                    (x - 1, y), (x + 1, y),
-                    (x, y - 1), (x, y + 1)
-                ]
-
-                for nx, ny in neighbors:
-                    if 0 <= nx < GRID_WIDTH and 0 <= ny < GRID_HEIGHT and grid[ny][nx] == 1 and (nx, ny) not in visited:
-                        parents[(nx, ny)] = current
-                        queue.append((nx, ny))
-            return []
-
-        start = (self.location.char_x, self.location.char_y)
-        goal = (target.location.char_x, target.location.char_y)
-        return bfs(start, goal)
-
-master_yoda = MasterYoda("Master Yoda", "good", Location(6, 5), 3)
-luke_skywalker = LukeSkywalker("Luke Skywalker", "good", Location(6, 5), 3)
-
-stormtrooper_start_positions = {}
-storm_troopers = []
-
-kyloren_start_positions = {}
-kylo_rens = []
-
-darth_vader_start_positions = {}
-darth_vaders = []
-
-with open("config.txt", "r") as file:
-    lines = file.readlines()
-
-for line in lines:
-    line = line.strip()
-    if "Character:" in line and "Door:" in line:
-        parts = line.split(",")
-        character_info = parts[0].split(":")[1].strip()
-        door_info = parts[1].split(":")[1].strip()
-
-        if door_info == "A":
-            door_x, door_y = 0, 5
-        elif door_info == "B":
-            door_x, door_y = 4, 0
-        elif door_info == "C":
-            door_x, door_y = 12, 0
-        elif door_info == "D":
-            door_x, door_y = 13, 5
-        elif door_info == "E":
-            door_x, door_y = 4, 10
-
-        if character_info == "Stormtrooper":
-            stormtrooper_id = len(storm_troopers)
-            storm_trooper = Stormtrooper(f"Stormtrooper_{stormtrooper_id}", "evil", Location(door_x, door_y))
-            storm_troopers.append(storm_trooper)
-            stormtrooper_start_positions[stormtrooper_id] = (door_x, door_y)
-
-        elif character_info == "Kyloren":
-            kylo_ren_id = len(kylo_rens)
-            kylo_ren = KyloRen(f"KyloRen_{kylo_ren_id}", "evil", Location(door_x, door_y))
-            kylo_rens.append(kylo_ren)
-            kyloren_start_positions[kylo_ren_id] = (door_x, door_y)
-        
-        elif character_info == "Darthvader":
-            darth_vader_id = len(darth_vaders)
-            darth_vader = DarthVader(f"DarthVader_{darth_vader_id}", "evil", Location(door_x, door_y))
-            darth_vaders.append(darth_vader)
-            darth_vader_start_positions[darth_vader_id] = (door_x, door_y)
-
-MASTER_YODA_IMAGE = pygame.image.load(os.path.join(assets_path, "masteryoda.png"))
-MASTER_YODA = pygame.transform.scale(MASTER_YODA_IMAGE, (CHARACTER_WIDTH, CHARACTER_HEIGHT))
-
-LUKE_SKYWALKER_IMAGE = pygame.image.load(os.path.join(assets_path, "lukeskywalker.png"))
-LUKE_SKYWALKER = pygame.transform.scale(LUKE_SKYWALKER_IMAGE, (CHARACTER_WIDTH, CHARACTER_HEIGHT))
-
-STORMTROOPER_IMAGE = pygame.image.load(os.path.join(assets_path, "stormtrooper.png"))
-STORMTROOPER = pygame.transform.scale(STORMTROOPER_IMAGE, (CHARACTER_WIDTH, CHARACTER_HEIGHT))
-
-KYLO_REN_IMAGE = pygame.image.load(os.path.join(assets_path, "kyloren.png"))
-KYLO_REN = pygame.transform.scale(KYLO_REN_IMAGE, (CHARACTER_WIDTH, CHARACTER_HEIGHT))
-
-DARTH_VADER_IMAGE = pygame.image.load(os.path.join(assets_path, "darthvader.png"))
-DARTH_VADER = pygame.transform.scale(DARTH_VADER_IMAGE, (CHARACTER_WIDTH, CHARACTER_HEIGHT))
-
-TROPHY_IMAGE = pygame.image.load(os.path.join(assets_path, "trophy.png"))
-TROPHY = pygame.transform.scale(TROPHY_IMAGE, (CHARACTER_WIDTH + 20, CHARACTER_HEIGHT + 10))
-
-OK_IMAGE = pygame.image.load(os.path.join(assets_path, "ok.png"))
-OK = pygame.transform.scale(OK_IMAGE, (CHARACTER_WIDTH, CHARACTER_HEIGHT))
-
-LOGO_IMAGE = pygame.image.load(os.path.join(assets_path, "logo.png"))
-LOGO = pygame.transform.scale(LOGO_IMAGE, (400, 200))
-
-HALF_IMAGE = pygame.image.load(os.path.join(assets_path, "half.png"))
-HALF = pygame.transform.scale(HALF_IMAGE, (CHARACTER_WIDTH, CHARACTER_HEIGHT))
-
-HEART_IMAGE = pygame.image.load(os.path.join(assets_path, "heart.png"))
-HEART = pygame.transform.scale(HEART_IMAGE, (CHARACTER_WIDTH, CHARACTER_HEIGHT))
-
-ROTATED_OK_90 = pygame.transform.rotate(OK, 90)
-ROTATED_OK_180 = pygame.transform.rotate(OK, 180)
-ROTATED_OK_270 = pygame.transform.rotate(OK, 270)
-
-GRID_PIXEL_WIDTH = GRID_WIDTH * GRID_SIZE
-GRID_PIXEL_HEIGHT = GRID_HEIGHT * GRID_SIZE
-
-OFFSET_X = (SCREEN_WIDTH - GRID_PIXEL_WIDTH) // 2
-OFFSET_Y = (SCREEN_HEIGHT - GRID_PIXEL_HEIGHT) // 2
-
-original_grid = [row[:] for row in grid]
-
-luke_skywalker_start_char_x = 6
-luke_skywalker_start_char_y = 5
-
-master_yoda_start_char_x = 6
-master_yoda_start_char_y = 5
-
-def draw_screen(character):
-    SCREEN.fill((173, 216, 230))
-
-    label_positions = {
-        (0, 5): "A",
-        (4, 0): "B",
-        (12, 0): "C",
-        (13, 5): "D",
-        (4, 10): "E",
-    }
-
-    font = pygame.font.Font(None, 24)
-
-    for row in range(GRID_HEIGHT):
-        for col in range(GRID_WIDTH):
-            value = grid[row][col]
-
-            label = label_positions.get((col, row))
-            if label:
-                color = "DARKBLUE"
-            elif value == 1:
-                color = (173, 216, 230)
-            else:
-                color = "WHITE"
-
-            rect_x = OFFSET_X + col * GRID_SIZE
-            rect_y = OFFSET_Y + row * GRID_SIZE
- 
-            pygame.draw.rect(SCREEN, color, (rect_x, rect_y, GRID_SIZE, GRID_SIZE))
-            pygame.draw.rect(SCREEN, "DARK GRAY", (rect_x, rect_y, GRID_SIZE, GRID_SIZE), 1)
-    
-    rect_x = OFFSET_X + luke_skywalker_start_char_x * GRID_SIZE
-    rect_y = OFFSET_Y + luke_skywalker_start_char_y * GRID_SIZE
-    pygame.draw.rect(SCREEN, "YELLOW", (rect_x, rect_y, GRID_SIZE, GRID_SIZE))
-    
-    red_surface = pygame.Surface((GRID_SIZE, GRID_SIZE), pygame.SRCALPHA)
-    red_surface.fill((255, 0, 0, 100))
-
-    for enemy in storm_troopers + kylo_rens + darth_vaders:
-        path = enemy.shortest_path(selected_character, grid)
-        for (x, y) in path:
-            rect_x = OFFSET_X + x * GRID_SIZE
-            rect_y = OFFSET_Y + y * GRID_SIZE
-            SCREEN.blit(red_surface, (rect_x, rect_y, GRID_SIZE, GRID_SIZE))
-
-    for row in range(GRID_HEIGHT):
-        for col in range(GRID_WIDTH):
-            value = grid[row][col]
-
-            rect_x = OFFSET_X + col * GRID_SIZE
-            rect_y = OFFSET_Y + row * GRID_SIZE
-
-            label = label_positions.get((col, row))
-            if label:
-                text = font.render(label, True, "WHITE")
-                text_rect = text.get_rect(center=(rect_x + GRID_SIZE // 2, rect_y + GRID_SIZE // 2))
-                SCREEN.blit(text, text_rect)
-            else:
-                text = font.render(str(value), True, "BLACK")
-                text_rect = text.get_rect(center=(rect_x + GRID_SIZE // 2, rect_y + GRID_SIZE // 2))
-                SCREEN.blit(text, text_rect)
-
-    for storm_trooper in storm_troopers:
-        SCREEN.blit(STORMTROOPER, (OFFSET_X + storm_trooper.location.char_x * GRID_SIZE, OFFSET_Y + storm_trooper.location.char_y * GRID_SIZE))
-    for kylo_ren in kylo_rens:
-        SCREEN.blit(KYLO_REN, (OFFSET_X + kylo_ren.location.char_x * GRID_SIZE, OFFSET_Y + kylo_ren.location.char_y * GRID_SIZE))
-    for darth_vader in darth_vaders:
-        SCREEN.blit(DARTH_VADER, (OFFSET_X + darth_vader.location.char_x * GRID_SIZE, OFFSET_Y + darth_vader.location.char_y * GRID_SIZE))
-
-    if selected_character == master_yoda:
-        SCREEN.blit(MASTER_YODA, (OFFSET_X + character.x, OFFSET_Y + character.y))
-    elif selected_character == luke_skywalker:
-        SCREEN.blit(LUKE_SKYWALKER, (OFFSET_X + character.x, OFFSET_Y + character.y))
-    
-    SCREEN.blit(TROPHY, (OFFSET_X + GRID_SIZE * GRID_WIDTH - 10, OFFSET_Y + GRID_SIZE * GRID_HEIGHT - 100))
-    SCREEN.blit(OK, (OFFSET_X - 60, OFFSET_Y + GRID_SIZE * 5))
-    SCREEN.blit(ROTATED_OK_270, (OFFSET_X + GRID_SIZE * 4, OFFSET_Y - 60))
-    SCREEN.blit(ROTATED_OK_270, (OFFSET_X + GRID_SIZE * 12, OFFSET_Y - 60))
-    SCREEN.blit(ROTATED_OK_90, (OFFSET_X + GRID_SIZE * 4, OFFSET_Y + GRID_SIZE * 10 + 60))
-    SCREEN.blit(ROTATED_OK_180, (OFFSET_X + GRID_SIZE * 13 + 60, OFFSET_Y + GRID_SIZE * 5))
-    
-    font = pygame.font.Font(None, 50)
-    text_health = font.render("Health:", True, "BLACK")
-
-    if selected_character == master_yoda and master_yoda.health == 3:
-        SCREEN.blit(text_health, (OFFSET_X + GRID_SIZE * 10 + 15, OFFSET_Y + GRID_SIZE * 12 + 5))
-        SCREEN.blit(HEART,(OFFSET_X + GRID_SIZE * 15, OFFSET_Y + GRID_SIZE * 12))
-        SCREEN.blit(HEART,(OFFSET_X + GRID_SIZE * 14, OFFSET_Y + GRID_SIZE * 12))
-        SCREEN.blit(HEART,(OFFSET_X + GRID_SIZE * 13, OFFSET_Y + GRID_SIZE * 12))
-    elif selected_character == master_yoda and master_yoda.health == 2.5:
-        SCREEN.blit(text_health, (OFFSET_X + GRID_SIZE * 10 + 15, OFFSET_Y + GRID_SIZE * 12 + 5))
-        SCREEN.blit(HALF,(OFFSET_X + GRID_SIZE * 15, OFFSET_Y + GRID_SIZE * 12))
-        SCREEN.blit(HEART,(OFFSET_X + GRID_SIZE * 14, OFFSET_Y + GRID_SIZE * 12))
-        SCREEN.blit(HEART,(OFFSET_X + GRID_SIZE * 13, OFFSET_Y + GRID_SIZE * 12))
-    elif selected_character == master_yoda and master_yoda.health == 2:
-        SCREEN.blit(text_health, (OFFSET_X + GRID_SIZE * 11 + 15, OFFSET_Y + GRID_SIZE * 12 + 5))
-        SCREEN.blit(HEART,(OFFSET_X + GRID_SIZE * 15, OFFSET_Y + GRID_SIZE * 12))
-        SCREEN.blit(HEART,(OFFSET_X + GRID_SIZE * 14, OFFSET_Y + GRID_SIZE * 12))
-    elif selected_character == master_yoda and master_yoda.health == 1.5:
-        SCREEN.blit(text_health, (OFFSET_X + GRID_SIZE * 11 + 15, OFFSET_Y + GRID_SIZE * 12 + 5))
-        SCREEN.blit(HALF,(OFFSET_X + GRID_SIZE * 15, OFFSET_Y + GRID_SIZE * 12))
-        SCREEN.blit(HEART,(OFFSET_X + GRID_SIZE * 14, OFFSET_Y + GRID_SIZE * 12))
-    elif selected_character == master_yoda and master_yoda.health == 1:
-        SCREEN.blit(text_health, (OFFSET_X + GRID_SIZE * 12 + 15, OFFSET_Y + GRID_SIZE * 12 + 5))
-        SCREEN.blit(HEART,(OFFSET_X + GRID_SIZE * 15, OFFSET_Y + GRID_SIZE * 12))
-    elif selected_character == master_yoda and master_yoda.health == 0.5:
-        SCREEN.blit(text_health, (OFFSET_X + GRID_SIZE * 12 + 15, OFFSET_Y + GRID_SIZE * 12 + 5))
-        SCREEN.blit(HALF,(OFFSET_X + GRID_SIZE * 15, OFFSET_Y + GRID_SIZE * 12))
-    if selected_character == luke_skywalker and luke_skywalker.health == 3:
-        SCREEN.blit(text_health, (OFFSET_X + GRID_SIZE * 10 + 15, OFFSET_Y + GRID_SIZE * 12 + 5))
-        SCREEN.blit(HEART,(OFFSET_X + GRID_SIZE * 15, OFFSET_Y + GRID_SIZE * 12))
-        SCREEN.blit(HEART,(OFFSET_X + GRID_SIZE * 14, OFFSET_Y + GRID_SIZE * 12))
-        SCREEN.blit(HEART,(OFFSET_X + GRID_SIZE * 13, OFFSET_Y + GRID_SIZE * 12))
-    elif selected_character == luke_skywalker and luke_skywalker.health == 2:
-        SCREEN.blit(text_health, (OFFSET_X + GRID_SIZE * 11 + 15, OFFSET_Y + GRID_SIZE * 12 + 5))
-        SCREEN.blit(HEART,(OFFSET_X + GRID_SIZE * 15, OFFSET_Y + GRID_SIZE * 12))
-        SCREEN.blit(HEART,(OFFSET_X + GRID_SIZE * 14, OFFSET_Y + GRID_SIZE * 12))
-    elif selected_character == luke_skywalker and luke_skywalker.health == 1:
-        SCREEN.blit(text_health, (OFFSET_X + GRID_SIZE * 12 + 15, OFFSET_Y + GRID_SIZE * 12 + 5))
-        SCREEN.blit(HEART,(OFFSET_X + GRID_SIZE * 15, OFFSET_Y + GRID_SIZE * 12))
-
-    pygame.display.update()
-
-pygame.mixer.init()
-pygame.mixer.music.load(music_path)
-click = pygame.mixer.Sound(click_sound_path)
-effect = pygame.mixer.Sound(effect_sound_path)
-victory = pygame.mixer.Sound(victory_sound_path) 
-
-def choose_screen():
-    global selected_character
-    SCREEN.fill("BLACK")
-    MASTER_YODA_RECT = pygame.Rect(SCREEN_WIDTH // 2 + 100, SCREEN_HEIGHT // 2 + 100, 200, 200)
-    LUKE_SKYWALKER_RECT = pygame.Rect(SCREEN_WIDTH // 2 - 300, SCREEN_HEIGHT // 2 + 100, 200, 200)
-    MASTER_YODA_CHOOSE = pygame.transform.scale(MASTER_YODA_IMAGE, (200, 200))
-    LUKE_SKYWALKER_CHOOSE = pygame.transform.scale(LUKE_SKYWALKER_IMAGE, (200, 200))
-    SCREEN.blit(MASTER_YODA_CHOOSE, (MASTER_YODA_RECT.x, MASTER_YODA_RECT.y))
-    SCREEN.blit(LUKE_SKYWALKER_CHOOSE, (LUKE_SKYWALKER_RECT.x, LUKE_SKYWALKER_RECT.y))
-    font = pygame.font.Font(None, 36)
-    text_yoda = font.render("Master Yoda", True, "WHITE")
-    text_luke = font.render("Luke Skywalker", True, "WHITE")
-    text_prompt = font.render("Please select the character you want to play!", True, "RED")
-
-    SCREEN.blit(LOGO, (SCREEN_WIDTH // 2 - 210, SCREEN_HEIGHT // 2 - 330))
-    SCREEN.blit(text_yoda, (MASTER_YODA_RECT.x + 20, MASTER_YODA_RECT.y - 40))
-    SCREEN.blit(text_luke, (LUKE_SKYWALKER_RECT.x + 20, LUKE_SKYWALKER_RECT.y - 40))
-    SCREEN.blit(text_prompt, (SCREEN_WIDTH // 2 - 270, SCREEN_HEIGHT // 2 - 50))
-    pygame.display.update()
-    
-    pygame.mixer.music.play(-1)
-
-    running = True
-    while running:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()  # Programı tamamen sonlandır
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                pygame.mixer.Sound.play(click)
-                if MASTER_YODA_RECT.collidepoint(event.pos):
-                    selected_character = master_yoda
-                    pygame.time.wait(500)
-                    running = False  
-                elif LUKE_SKYWALKER_RECT.collidepoint(event.pos):
-                    selected_character = luke_skywalker
-                    pygame.time.wait(500)
-                    running = False
-        pygame.display.update()
-
-    pygame.mixer.music.stop()
-
-enemies = storm_troopers + kylo_rens + darth_vaders
-
-def check_and_reset(selected_character, enemies, grid, original_grid):
-    for enemy in enemies:
-        if (selected_character.location.char_x == enemy.location.char_x and 
-            selected_character.location.char_y == enemy.location.char_y):
-            
-            if isinstance(selected_character, MasterYoda):
-                selected_character.decrease_health()
-
-            elif isinstance(selected_character, LukeSkywalker):
-                selected_character.decrease_health()
-
-            pygame.mixer.Sound.play(effect)
-            pygame.time.wait(1000)
-            pygame.event.clear()
-
-            # Reset the grid
-            grid[:] = [row[:] for row in original_grid]
-
-            for i, storm_trooper in enumerate(storm_troopers):
-                start_position = stormtrooper_start_positions[i]
-                storm_trooper.location.char_x, storm_trooper.location.char_y = start_position
-            
-            for i, kylo_ren in enumerate(kylo_rens):
-                start_position = kyloren_start_positions[i]
-                kylo_ren.location.char_x, kylo_ren.location.char_y = start_position
-
-            for i, darth_vader in enumerate(darth_vaders):
-                start_position = darth_vader_start_positions[i]
-                darth_vader.location.char_x, darth_vader.location.char_y = start_position
-
-            if isinstance(selected_character, MasterYoda):
-                selected_character.location.char_x = master_yoda_start_char_x
-                selected_character.location.char_y = master_yoda_start_char_y
-            elif isinstance(selected_character, LukeSkywalker):
-                selected_character.location.char_x = luke_skywalker_start_char_x
-                selected_character.location.char_y = luke_skywalker_start_char_y
-
-            return True
-    return False
-
-def reset_game():
-    global selected_character, grid, original_grid, master_yoda, luke_skywalker
-
-    grid = [row[:] for row in original_grid]
-
-    master_yoda.location.char_x = master_yoda_start_char_x
-    master_yoda.location.char_y = master_yoda_start_char_y
-    master_yoda.set_health(3)
-
-    luke_skywalker.location.char_x = luke_skywalker_start_char_x
-    luke_skywalker.location.char_y = luke_skywalker_start_char_y
-    luke_skywalker.set_health(3)
-
-    for i, storm_trooper in enumerate(storm_troopers):
-        start_position = stormtrooper_start_positions[i]
-        storm_trooper.location.char_x, storm_trooper.location.char_y = start_position
-
-    for i, kylo_ren in enumerate(kylo_rens):
-        start_position = kyloren_start_positions[i]
-        kylo_ren.location.char_x, kylo_ren.location.char_y = start_position
-
-    for i, darth_vader in enumerate(darth_vaders):
-        start_position = darth_vader_start_positions[i]
-        darth_vader.location.char_x, darth_vader.location.char_y = start_position
-
-    choose_screen()
-
-def game_over_screen():
-    SCREEN.fill("BLACK")
-    font = pygame.font.Font(None, 100)
-    text = font.render("GAME OVER", True, "RED")
-    text_rect = text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
-    SCREEN.blit(text, text_rect)
-    pygame.display.update()
-
-    pygame.time.wait(3000)
-    reset_game()
-
-winning_position = (13, 9)
-
-def game_won_screen():
-    SCREEN.fill("BLACK")
-    font = pygame.font.Font(None, 100)
-    text = font.render("YOU WON THE GAME!", True, "GREEN")
-    text_rect = text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
-    SCREEN.blit(text, text_rect)
-    pygame.display.update()
-    pygame.mixer.Sound.play(victory)
-    pygame.time.wait(4300) 
-    reset_game()
-
-def main():
-    pygame.init()
-    clock = pygame.time.Clock()
-    global selected_character
-    global grid
-    selected_character = None
-    choose_screen()
-
-    player_made_move = False
-    while True:
-        clock.tick(FPS)
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-
-            if event.type == pygame.KEYDOWN:
-                if selected_character == master_yoda:
-                    if event.key == pygame.K_LEFT:
-                        selected_character.move("left", grid)
-                        player_made_move = True
-                    elif event.key == pygame.K_RIGHT:
-                        selected_character.move("right", grid)
-                        player_made_move = True
-                    elif event.key == pygame.K_UP:
-                        selected_character.move("up", grid)
-                        player_made_move = True
-                    elif event.key == pygame.K_DOWN:
-                        selected_character.move("down", grid)
-                        player_made_move = True
-                elif selected_character == luke_skywalker:
-                    if event.key == pygame.K_LEFT:
-                        selected_character.move("left", grid)
-                        player_made_move = True
-                    elif event.key == pygame.K_RIGHT:
-                        selected_character.move("right", grid)
-                        player_made_move = True
-                    elif event.key == pygame.K_UP:
-                        selected_character.move("up", grid)
-                        player_made_move = True
-                    elif event.key == pygame.K_DOWN:
-                        selected_character.move("down", grid)
-                        player_made_move = True
-
-        if (selected_character.location.get_x(), selected_character.location.get_y()) == winning_position:
-            game_won_screen()
-
-        if check_and_reset(selected_character, enemies, grid, original_grid):
-            if selected_character.get_health() <= 0:
-                game_over_screen()
-            player_made_move = False
-            continue
-
-        if player_made_move:
-
-            for storm_trooper in storm_troopers:
-                path = storm_trooper.shortest_path(selected_character, grid)
-                if path and len(path) > 1:
-                    storm_trooper.location.char_x, storm_trooper.location.char_y = path[1]
-
-            for kylo_ren in kylo_rens:
-                path = kylo_ren.shortest_path(selected_character, grid)
-                if path and len(path) > 2:
-                    kylo_ren.location.char_x, kylo_ren.location.char_y = path[2]
-                elif path and len(path) > 1:
-                    kylo_ren.location.char_x, kylo_ren.location.char_y = path[1]
-
-            for darth_vader in darth_vaders:
-                path = darth_vader.shortest_path(selected_character, grid)
-                if path and len(path) > 1:
-                    darth_vader.location.char_x, darth_vader.location.char_y = path[1]
-                    current_x, current_y = darth_vader.location.char_x, darth_vader.location.char_y
-                    if grid[current_y][current_x] == 0:
-                        grid[current_y][current_x] = 1 
-
-            player_made_move = False 
-
-        character = pygame.Rect(selected_character.location.char_x * GRID_SIZE, selected_character.location.char_y * GRID_SIZE, CHARACTER_WIDTH, CHARACTER_HEIGHT)
-        draw_screen(character)
-main()
\ No newline at end of file
+import argparse
+import pygame
+import os
+import sys
+import time
+from collections import deque
+from autopilot import DEFAULT_BUDGET_MS, Autopilot
+from engine import GameState
+from profiler import profiler
+from rendering import AssetManager, ChunkCache, DirtyRectRenderer, text_cache
+from replay import Recording, character_name, check_map, select
+from scheduler import FixedTimestep, Scheduler
+from snapshot import NO_CHARACTER, Snapshot
+
+SCREEN_WIDTH = 1920
+SCREEN_HEIGHT = 1020
+
+SCREEN = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+pygame.display.set_caption("Star Wars")
+
+if getattr(sys, 'frozen', False):
+    current_dir = sys._MEIPASS
+else:
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+
+config_path = os.path.join(current_dir, "config.txt")
+assets_path = os.path.join(current_dir, "Assets")
+click_sound_path = os.path.join(current_dir, "click.mp3")
+effect_sound_path = os.path.join(current_dir, "effect.mp3")
+music_path = os.path.join(current_dir, "music.mp3")
+victory_sound_path = os.path.join(current_dir, "victory.mp3")
+icon_path = os.path.join(current_dir, "icon.png")
+icon = pygame.image.load(icon_path)
+pygame.display.set_icon(icon)
+
+FPS = 60
+
+GRID_SIZE = 50
+
+CHARACTER_WIDTH = GRID_SIZE
+CHARACTER_HEIGHT = GRID_SIZE
+
+SPRITE_SIZE = (CHARACTER_WIDTH, CHARACTER_HEIGHT)
+TROPHY_SIZE = (CHARACTER_WIDTH + 20, CHARACTER_HEIGHT + 10)
+PORTRAIT_SIZE = (200, 200)
+
+assets = AssetManager(assets_path)
+# Everything drawn during play shares one atlas; the logo and portraits are
+# only shown on the choose screen and stay as separate surfaces.
+assets.pack(
+    [(name, SPRITE_SIZE, 0) for name in ("masteryoda.png", "lukeskywalker.png", "stormtrooper.png", "kyloren.png", "darthvader.png", "ok.png", "half.png", "heart.png")]
+    + [("ok.png", SPRITE_SIZE, angle) for angle in (90, 180, 270)]
+    + [("trophy.png", TROPHY_SIZE, 0)]
+)
+
+MASTER_YODA = assets.sprite("masteryoda.png", SPRITE_SIZE)
+LUKE_SKYWALKER = assets.sprite("lukeskywalker.png", SPRITE_SIZE)
+STORMTROOPER = assets.sprite("stormtrooper.png", SPRITE_SIZE)
+KYLO_REN = assets.sprite("kyloren.png", SPRITE_SIZE)
+DARTH_VADER = assets.sprite("darthvader.png", SPRITE_SIZE)
+TROPHY = assets.sprite("trophy.png", TROPHY_SIZE)
+OK = assets.sprite("ok.png", SPRITE_SIZE)
+HALF = assets.sprite("half.png", SPRITE_SIZE)
+HEART = assets.sprite("heart.png", SPRITE_SIZE)
+
+# Indexed by enemy kind (stormtrooper, Kylo Ren, Darth Vader).
+ENEMY_SPRITES = (STORMTROOPER, KYLO_REN, DARTH_VADER)
+
+ROTATED_OK_90 = assets.sprite("ok.png", SPRITE_SIZE, 90)
+ROTATED_OK_180 = assets.sprite("ok.png", SPRITE_SIZE, 180)
+ROTATED_OK_270 = assets.sprite("ok.png", SPRITE_SIZE, 270)
+
+LOGO = assets.sprite("logo.png", (400, 200))
+MASTER_YODA_CHOOSE = assets.sprite("masteryoda.png", PORTRAIT_SIZE)
+LUKE_SKYWALKER_CHOOSE = assets.sprite("lukeskywalker.png", PORTRAIT_SIZE)
+
+CHUNK_TILES = 8
+# Keeps the door arrows and trophy, which sit just outside the grid, on
+# screen when a large map is scrolled to one of its edges.
+CAMERA_MARGIN = GRID_SIZE + 20
+
+def camera_axis(map_pixels, screen_pixels, player_pixel):
+    # Maps that fit stay centred; larger ones scroll to keep the player in
+    # the middle of the screen without showing more than the margin past
+    # the map edge.
+    if map_pixels <= screen_pixels:
+        return (screen_pixels - map_pixels) // 2
+    offset = screen_pixels // 2 - player_pixel - GRID_SIZE // 2
+    return max(screen_pixels - map_pixels - CAMERA_MARGIN, min(CAMERA_MARGIN, offset))
+
+def camera_offset(position):
+    return (
+        camera_axis(GRID_PIXEL_WIDTH, SCREEN_WIDTH, position[0] * GRID_SIZE),
+        camera_axis(GRID_PIXEL_HEIGHT, SCREEN_HEIGHT, position[1] * GRID_SIZE),
+    )
+
+def set_state(new_state):
+    # Swaps in another game (e.g. a synthetic benchmark map) and recomputes
+    # the layout that depends on the map size.
+    global state, GRID_WIDTH, GRID_HEIGHT, GRID_PIXEL_WIDTH, GRID_PIXEL_HEIGHT, OFFSET_X, OFFSET_Y, HUD_X, HUD_Y, label_positions, overlay_version
+    state = new_state
+    label_positions = {position: label for label, position in state.doors.items()}
+    GRID_WIDTH = state.width
+    GRID_HEIGHT = state.height
+
+    GRID_PIXEL_WIDTH = GRID_WIDTH * GRID_SIZE
+    GRID_PIXEL_HEIGHT = GRID_HEIGHT * GRID_SIZE
+
+    OFFSET_X, OFFSET_Y = camera_offset(state.player_start)
+
+    # The health bar sits under the default map; on maps that scroll it is
+    # pinned to the bottom-right corner of the screen instead.
+    if GRID_PIXEL_WIDTH <= SCREEN_WIDTH and GRID_PIXEL_HEIGHT <= SCREEN_HEIGHT:
+        HUD_X, HUD_Y = OFFSET_X, OFFSET_Y
+    else:
+        HUD_X = SCREEN_WIDTH - GRID_SIZE * 16 - 10
+        HUD_Y = SCREEN_HEIGHT - GRID_SIZE * 13 - 10
+
+    overlay_version = None
+    if background is not None:
+        build_background()
+
+label_positions = {}
+
+background = None
+chunks = None
+renderer = None
+path_surface = None
+overlay_version = None
+overlay_items = []
+
+set_state(GameState.from_config(config_path))
+
+def draw_tile(surface, col, row, origin_x, origin_y):
+    value = state.grid[row][col]
+
+    label = label_positions.get((col, row))
+    if label:
+        color = "DARKBLUE"
+    elif value == 1:
+        color = (173, 216, 230)
+    else:
+        color = "WHITE"
+
+    rect = pygame.Rect(origin_x + col * GRID_SIZE, origin_y + row * GRID_SIZE, GRID_SIZE, GRID_SIZE)
+
+    pygame.draw.rect(surface, color, rect)
+    pygame.draw.rect(surface, "DARK GRAY", rect, 1)
+    if (col, row) == state.player_start:
+        pygame.draw.rect(surface, "YELLOW", rect)
+
+    if label:
+        text = text_cache.render(None, 24, label, "WHITE")
+    else:
+        text = text_cache.render(None, 24, str(value), "BLACK")
+    surface.blit(text, text.get_rect(center=rect.center))
+    return rect
+
+def draw_decorations(surface):
+    goal_x, goal_y = state.winning_position
+    surface.blit(TROPHY, (OFFSET_X + GRID_SIZE * (goal_x + 1) - 10, OFFSET_Y + GRID_SIZE * goal_y))
+    # An arrow points into every door on the edge of the map.
+    for door_x, door_y in state.doors.values():
+        if door_x == 0:
+            surface.blit(OK, (OFFSET_X - 60, OFFSET_Y + GRID_SIZE * door_y))
+        elif door_x == GRID_WIDTH - 1:
+            surface.blit(ROTATED_OK_180, (OFFSET_X + GRID_SIZE * door_x + 60, OFFSET_Y + GRID_SIZE * door_y))
+        elif door_y == 0:
+            surface.blit(ROTATED_OK_270, (OFFSET_X + GRID_SIZE * door_x, OFFSET_Y - 60))
+        elif door_y == GRID_HEIGHT - 1:
+            surface.blit(ROTATED_OK_90, (OFFSET_X + GRID_SIZE * door_x, OFFSET_Y + GRID_SIZE * door_y + 60))
+
+def chunk_origin(chunk_x, chunk_y):
+    return -chunk_x * CHUNK_TILES * GRID_SIZE, -chunk_y * CHUNK_TILES * GRID_SIZE
+
+def render_chunk(surface, chunk_x, chunk_y):
+    surface.fill((173, 216, 230))
+    origin_x, origin_y = chunk_origin(chunk_x, chunk_y)
+    first_col, first_row = chunk_x * CHUNK_TILES, chunk_y * CHUNK_TILES
+    for row in range(first_row, min(first_row + CHUNK_TILES, GRID_HEIGHT)):
+        for col in range(first_col, min(first_col + CHUNK_TILES, GRID_WIDTH)):
+            draw_tile(surface, col, row, origin_x, origin_y)
+
+def visible_cells():
+    first_col = max(0, -OFFSET_X // GRID_SIZE)
+    first_row = max(0, -OFFSET_Y // GRID_SIZE)
+    last_col = min(GRID_WIDTH, (SCREEN_WIDTH - OFFSET_X) // GRID_SIZE + 1)
+    last_row = min(GRID_HEIGHT, (SCREEN_HEIGHT - OFFSET_Y) // GRID_SIZE + 1)
+    return first_col, first_row, last_col, last_row
+
+def is_visible(x, y, view):
+    first_col, first_row, last_col, last_row = view
+    return first_col <= x < last_col and first_row <= y < last_row
+
+def compose_view():
+    # Rebuilds the screen-sized background from the chunks under the camera.
+    background.fill((173, 216, 230))
+    first_col, first_row, last_col, last_row = visible_cells()
+    chunk_pixels = CHUNK_TILES * GRID_SIZE
+    for chunk_y in range(first_row // CHUNK_TILES, (last_row - 1) // CHUNK_TILES + 1):
+        for chunk_x in range(first_col // CHUNK_TILES, (last_col - 1) // CHUNK_TILES + 1):
+            background.blit(chunks.get(chunk_x, chunk_y), (OFFSET_X + chunk_x * chunk_pixels, OFFSET_Y + chunk_y * chunk_pixels))
+    draw_decorations(background)
+    renderer.invalidate()
+
+def update_camera():
+    global OFFSET_X, OFFSET_Y
+    offset = camera_offset(state.selected_character.get_position())
+    if offset != (OFFSET_X, OFFSET_Y):
+        OFFSET_X, OFFSET_Y = offset
+        compose_view()
+
+def build_background():
+    global background, chunks, renderer, path_surface
+    background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+    chunks = ChunkCache(render_chunk, CHUNK_TILES * GRID_SIZE)
+
+    path_surface = pygame.Surface((GRID_SIZE, GRID_SIZE), pygame.SRCALPHA)
+    path_surface.fill((255, 0, 0, 100))
+    renderer = DirtyRectRenderer(SCREEN, background)
+    compose_view()
+
+def patch_background(cells):
+    # Only the tiles whose wall state changed are redrawn, in their cached
+    # chunk and, when on screen, in the composed view; decorations that
+    # overlap them (the trophy) are re-blitted clipped to the tile.
+    if not cells:
+        return
+    start = profiler.start()
+    view = visible_cells()
+    for col, row in cells:
+        chunk_x, chunk_y = col // CHUNK_TILES, row // CHUNK_TILES
+        chunk = chunks.cached(chunk_x, chunk_y)
+        if chunk is not None:
+            draw_tile(chunk, col, row, *chunk_origin(chunk_x, chunk_y))
+        if not is_visible(col, row, view):
+            continue
+        rect = draw_tile(background, col, row, OFFSET_X, OFFSET_Y)
+        background.set_clip(rect)
+        draw_decorations(background)
+        background.set_clip(None)
+        renderer.patch(rect)
+    profiler.stop("grid", start)
+
+def enemy_path_overlay():
+    global overlay_version, overlay_items
+    # Only rebuilt when the game state or the camera has changed since the
+    # last frame. Paths are drawn for the enemies on screen, up to where
+    # they leave it: on a large map a whole path can cost more than the turn
+    # that moved the enemy along it.
+    if overlay_version != (state.version, OFFSET_X, OFFSET_Y):
+        view = visible_cells()
+        inside = lambda x, y: is_visible(x, y, view)
+        overlay_items = []
+        for enemy_id in state.enemy_ids:
+            if not inside(*state.enemy_position(enemy_id)):
+                continue
+            for (x, y) in state.enemy_path(enemy_id, inside):
+                overlay_items.append((path_surface, (OFFSET_X + x * GRID_SIZE, OFFSET_Y + y * GRID_SIZE)))
+        overlay_version = (state.version, OFFSET_X, OFFSET_Y)
+    return overlay_items
+
+def draw_screen(character):
+    # Tiles and door labels are baked into the chunks, so the "grid" phase
+    # covers both.
+    start = profiler.start()
+    update_camera()
+    view = visible_cells()
+    profiler.stop("grid", start)
+
+    start = profiler.start()
+    items = list(enemy_path_overlay())
+    profiler.stop("overlay", start)
+
+    start = profiler.start()
+    entities = state.entities
+    for kind, sprite in enumerate(ENEMY_SPRITES):
+        for enemy_id in entities.members[kind]:
+            x, y = entities.x[enemy_id], entities.y[enemy_id]
+            if is_visible(x, y, view):
+                items.append((sprite, (OFFSET_X + x * GRID_SIZE, OFFSET_Y + y * GRID_SIZE)))
+
+    if state.selected_character == state.master_yoda:
+        items.append((MASTER_YODA, (OFFSET_X + character.x, OFFSET_Y + character.y)))
+    elif state.selected_character == state.luke_skywalker:
+        items.append((LUKE_SKYWALKER, (OFFSET_X + character.x, OFFSET_Y + character.y)))
+    profiler.stop("sprites", start)
+
+    start = profiler.start()
+    health_text = text_cache.render(None, 50, "Health:", "BLACK")
+
+    if state.selected_character == state.master_yoda and state.master_yoda.health == 3:
+        items.append((health_text, (HUD_X + GRID_SIZE * 10 + 15, HUD_Y + GRID_SIZE * 12 + 5)))
+        items.append((HEART,(HUD_X + GRID_SIZE * 15, HUD_Y + GRID_SIZE * 12)))
+        items.append((HEART,(HUD_X + GRID_SIZE * 14, HUD_Y + GRID_SIZE * 12)))
+        items.append((HEART,(HUD_X + GRID_SIZE * 13, HUD_Y + GRID_SIZE * 12)))
+    elif state.selected_character == state.master_yoda and state.master_yoda.health == 2.5:
+        items.append((health_text, (HUD_X + GRID_SIZE * 10 + 15, HUD_Y + GRID_SIZE * 12 + 5)))
+        items.append((HALF,(HUD_X + GRID_SIZE * 15, HUD_Y + GRID_SIZE * 12)))
+        items.append((HEART,(HUD_X + GRID_SIZE * 14, HUD_Y + GRID_SIZE * 12)))
+        items.append((HEART,(HUD_X + GRID_SIZE * 13, HUD_Y + GRID_SIZE * 12)))
+    elif state.selected_character == state.master_yoda and state.master_yoda.health == 2:
+        items.append((health_text, (HUD_X + GRID_SIZE * 11 + 15, HUD_Y + GRID_SIZE * 12 + 5)))
+        items.append((HEART,(HUD_X + GRID_SIZE * 15, HUD_Y + GRID_SIZE * 12)))
+        items.append((HEART,(HUD_X + GRID_SIZE * 14, HUD_Y + GRID_SIZE * 12)))
+    elif state.selected_character == state.master_yoda and state.master_yoda.health == 1.5:
+        items.append((health_text, (HUD_X + GRID_SIZE * 11 + 15, HUD_Y + GRID_SIZE * 12 + 5)))
+        items.append((HALF,(HUD_X + GRID_SIZE * 15, HUD_Y + GRID_SIZE * 12)))
+        items.append((HEART,(HUD_X + GRID_SIZE * 14, HUD_Y + GRID_SIZE * 12)))
+    elif state.selected_character == state.master_yoda and state.master_yoda.health == 1:
+        items.append((health_text, (HUD_X + GRID_SIZE * 12 + 15, HUD_Y + GRID_SIZE * 12 + 5)))
+        items.append((HEART,(HUD_X + GRID_SIZE * 15, HUD_Y + GRID_SIZE * 12)))
+    elif state.selected_character == state.master_yoda and state.master_yoda.health == 0.5:
+        items.append((health_text, (HUD_X + GRID_SIZE * 12 + 15, HUD_Y + GRID_SIZE * 12 + 5)))
+        items.append((HALF,(HUD_X + GRID_SIZE * 15, HUD_Y + GRID_SIZE * 12)))
+    if state.selected_character == state.luke_skywalker and state.luke_skywalker.health == 3:
+        items.append((health_text, (HUD_X + GRID_SIZE * 10 + 15, HUD_Y + GRID_SIZE * 12 + 5)))
+        items.append((HEART,(HUD_X + GRID_SIZE * 15, HUD_Y + GRID_SIZE * 12)))
+        items.append((HEART,(HUD_X + GRID_SIZE * 14, HUD_Y + GRID_SIZE * 12)))
+        items.append((HEART,(HUD_X + GRID_SIZE * 13, HUD_Y + GRID_SIZE * 12)))
+    elif state.selected_character == state.luke_skywalker and state.luke_skywalker.health == 2:
+        items.append((health_text, (HUD_X + GRID_SIZE * 11 + 15, HUD_Y + GRID_SIZE * 12 + 5)))
+        items.append((HEART,(HUD_X + GRID_SIZE * 15, HUD_Y + GRID_SIZE * 12)))
+        items.append((HEART,(HUD_X + GRID_SIZE * 14, HUD_Y + GRID_SIZE * 12)))
+    elif state.selected_character == state.luke_skywalker and state.luke_skywalker.health == 1:
+        items.append((health_text, (HUD_X + GRID_SIZE * 12 + 15, HUD_Y + GRID_SIZE * 12 + 5)))
+        items.append((HEART,(HUD_X + GRID_SIZE * 15, HUD_Y + GRID_SIZE * 12)))
+    if profiler_visible:
+        items.append((profiler_overlay(), (10, 10)))
+    profiler.stop("hud", start)
+
+    start = profiler.start()
+    renderer.render(items)
+    profiler.stop("present", start)
+
+# F3 shows rolling per-phase timings in the top-left corner. The numbers
+# change every frame, so the panel is rebuilt a few times a second instead,
+# and without the text cache, which would keep every string ever drawn.
+PROFILER_KEY = pygame.K_F3
+PROFILER_REFRESH = 250
+profiler_visible = False
+profiler_panel = None
+profiler_refreshed = 0
+profile_trace_path = None
+
+def profiler_overlay():
+    global profiler_panel, profiler_refreshed
+    now = pygame.time.get_ticks()
+    if profiler_panel is not None and now - profiler_refreshed < PROFILER_REFRESH:
+        return profiler_panel
+    font = text_cache.font(None, 22)
+    rows = [("phase", "p50 ms", "p99 ms")]
+    rows += [(name, f"{p50:.2f}", f"{p99:.2f}") for name, p50, p99, count in profiler.percentiles()]
+    line_height = font.get_linesize()
+    profiler_panel = pygame.Surface((250, line_height * len(rows) + 10)).convert()
+    profiler_panel.fill((0, 0, 0))
+    for i, row in enumerate(rows):
+        for column, text in zip((8, 110, 180), row):
+            profiler_panel.blit(font.render(text, True, "WHITE"), (column, 5 + i * line_height))
+    profiler_refreshed = now
+    return profiler_panel
+
+def toggle_profiler():
+    global profiler_visible, profiler_panel
+    profiler_visible = not profiler_visible
+    profiler_panel = None
+    if profiler_visible:
+        profiler.enable()
+    else:
+        profiler.disable()
+
+pygame.mixer.init()
+pygame.mixer.music.load(music_path)
+click = pygame.mixer.Sound(click_sound_path)
+effect = pygame.mixer.Sound(effect_sound_path)
+victory = pygame.mixer.Sound(victory_sound_path) 
+
+MASTER_YODA_RECT = pygame.Rect(SCREEN_WIDTH // 2 + 100, SCREEN_HEIGHT // 2 + 100, 200, 200)
+LUKE_SKYWALKER_RECT = pygame.Rect(SCREEN_WIDTH // 2 - 300, SCREEN_HEIGHT // 2 + 100, 200, 200)
+
+# What the main loop is currently doing. Timed transitions between these go
+# through the scheduler, so the loop keeps ticking, pumping events and
+# answering QUIT during every pause.
+CHOOSING = "choosing"
+PLAYING = "playing"
+PAUSED = "paused"
+MESSAGE = "message"
+
+HIT_PAUSE = 1000
+CHOOSE_DELAY = 500
+GAME_OVER_DELAY = 3000
+GAME_WON_DELAY = 4300
+
+scheduler = Scheduler()
+mode = CHOOSING
+
+# Set by --record: every accepted move is logged and the file rewritten
+# whenever a game ends and on quit.
+recording = None
+recording_path = None
+
+REPLAY_FPS = 20
+
+# F5 saves the game in progress as a snapshot (see snapshot.py) and F9
+# loads it back, from the choose screen too. Loading isn't offered while
+# recording, since a recording can only replay games from the start.
+SAVE_KEY = pygame.K_F5
+LOAD_KEY = pygame.K_F9
+save_path = "savegame.sav"
+
+# Set by --autopilot: the search in autopilot.py plays the selected
+# character, one planned move per simulation tick, and arrow keys are
+# ignored.
+autopilot = None
+
+# Set by --idle-redraw: instead of drawing FPS frames a second the loop
+# sleeps in pygame.event.wait() until an event arrives or the next
+# scheduled task is due, and only draws when the state version, the mode
+# or the renderer says the screen is stale. On quit it reports how many
+# frames that skipped compared with the fixed rate, counting only the time
+# spent playing: the other screens are drawn once in both loops.
+idle_redraw = False
+drawn_key = None
+frames_drawn = 0
+# (wall clock, process CPU) when the choose screen first came up.
+session_started = (0.0, 0.0)
+playing_seconds = 0.0
+playing_since = None
+# Sampled the first time a game starts, while there is a board to draw.
+frame_cost = None
+
+# Arrow keys are queued and applied by a fixed-rate simulation: one move
+# per tick at most, SIMULATION_HZ ticks a second however fast frames are
+# drawn. A slow frame is caught up on the next one, so a stalled host
+# loses no moves and mashing keys can't outrun the tick rate. Keys beyond
+# INPUT_QUEUE_LIMIT are dropped rather than played seconds late.
+SIMULATION_HZ = 30
+INPUT_QUEUE_LIMIT = 4
+input_queue = deque()
+timestep = FixedTimestep(1000 / SIMULATION_HZ)
+
+def switch_mode(new_mode):
+    global mode, playing_seconds, playing_since
+    mode = new_mode
+    if mode in (PLAYING, PAUSED):
+        if playing_since is None:
+            playing_since = time.perf_counter()
+    elif playing_since is not None:
+        playing_seconds += time.perf_counter() - playing_since
+        playing_since = None
+    # Keys queued before a hit or the end of a game are dropped, as keys
+    # pressed during the pause are.
+    if mode != PLAYING:
+        input_queue.clear()
+
+def choose_screen():
+    SCREEN.fill("BLACK")
+    SCREEN.blit(MASTER_YODA_CHOOSE, (MASTER_YODA_RECT.x, MASTER_YODA_RECT.y))
+    SCREEN.blit(LUKE_SKYWALKER_CHOOSE, (LUKE_SKYWALKER_RECT.x, LUKE_SKYWALKER_RECT.y))
+    text_yoda = text_cache.render(None, 36, "Master Yoda", "WHITE")
+    text_luke = text_cache.render(None, 36, "Luke Skywalker", "WHITE")
+    text_prompt = text_cache.render(None, 36, "Please select the character you want to play!", "RED")
+
+    SCREEN.blit(LOGO, (SCREEN_WIDTH // 2 - 210, SCREEN_HEIGHT // 2 - 330))
+    SCREEN.blit(text_yoda, (MASTER_YODA_RECT.x + 20, MASTER_YODA_RECT.y - 40))
+    SCREEN.blit(text_luke, (LUKE_SKYWALKER_RECT.x + 20, LUKE_SKYWALKER_RECT.y - 40))
+    SCREEN.blit(text_prompt, (SCREEN_WIDTH // 2 - 270, SCREEN_HEIGHT // 2 - 50))
+    pygame.display.update()
+    
+    pygame.mixer.music.play(-1)
+    switch_mode(CHOOSING)
+
+def handle_choose_click(position):
+    pygame.mixer.Sound.play(click)
+    if MASTER_YODA_RECT.collidepoint(position):
+        state.select_character(state.master_yoda)
+    elif LUKE_SKYWALKER_RECT.collidepoint(position):
+        state.select_character(state.luke_skywalker)
+    else:
+        return
+    if recording is not None:
+        recording.start_game(character_name(state, state.selected_character))
+    switch_mode(MESSAGE)
+    scheduler.after(CHOOSE_DELAY, start_playing)
+
+def start_playing():
+    global frame_cost
+    pygame.mixer.music.stop()
+    if idle_redraw and frame_cost is None:
+        frame_cost = unchanged_frame_cost()
+    renderer.invalidate()
+    switch_mode(PLAYING)
+
+def reset_game():
+    patch_background(state.reset())
+    choose_screen()
+
+def game_over_screen():
+    SCREEN.fill("BLACK")
+    text = text_cache.render(None, 100, "GAME OVER", "RED")
+    text_rect = text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
+    SCREEN.blit(text, text_rect)
+    pygame.display.update()
+
+    switch_mode(MESSAGE)
+    scheduler.after(GAME_OVER_DELAY, reset_game)
+
+def game_won_screen():
+    SCREEN.fill("BLACK")
+    text = text_cache.render(None, 100, "YOU WON THE GAME!", "GREEN")
+    text_rect = text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
+    SCREEN.blit(text, text_rect)
+    pygame.display.update()
+    pygame.mixer.Sound.play(victory)
+    switch_mode(MESSAGE)
+    scheduler.after(GAME_WON_DELAY, reset_game)
+
+def end_hit_pause(lost):
+    if lost:
+        game_over_screen()
+    else:
+        switch_mode(PLAYING)
+
+KEY_DIRECTIONS = {
+    pygame.K_LEFT: "left",
+    pygame.K_RIGHT: "right",
+    pygame.K_UP: "up",
+    pygame.K_DOWN: "down",
+}
+
+def save_recording():
+    if recording is None:
+        return
+    if state.selected_character is not None:
+        recording.finish_game(state)
+    recording.save(recording_path)
+
+def save_game():
+    try:
+        state.snapshot().save(save_path)
+    except OSError as error:
+        print(f"could not save the game: {error}", file=sys.stderr)
+
+def load_game():
+    if recording is not None:
+        print("saved games can't be loaded while recording", file=sys.stderr)
+        return
+    try:
+        snapshot = Snapshot.load(save_path)
+        if snapshot.selected == NO_CHARACTER:
+            raise ValueError("the saved game has no character selected")
+        changed = state.restore(snapshot)
+    except (OSError, ValueError) as error:
+        print(f"could not load the game: {error}", file=sys.stderr)
+        return
+    scheduler.clear()
+    # Keys queued for the game being replaced would play on the loaded one.
+    input_queue.clear()
+    timestep.rest()
+    patch_background(changed)
+    start_playing()
+
+def quit_game():
+    save_recording()
+    if autopilot is not None and autopilot.plans:
+        stats = autopilot.stats()
+        print(f"autopilot: {stats['plans']} moves, {stats['nodes_per_s']:.0f} nodes/s, "
+              f"plan time mean {stats['mean_plan_ms']:.2f} ms, slowest {stats['slowest_plan_ms']:.2f} ms")
+    if idle_redraw:
+        report_idle_redraw(time.perf_counter() - session_started[0], time.process_time() - session_started[1])
+    if profile_trace_path is not None:
+        profiler.export(profile_trace_path)
+    pygame.quit()
+    sys.exit()
+
+def player_rect():
+    return pygame.Rect(state.selected_character.location.char_x * GRID_SIZE, state.selected_character.location.char_y * GRID_SIZE, CHARACTER_WIDTH, CHARACTER_HEIGHT)
+
+def handle_step_result(result):
+    patch_background(result.opened_cells + result.restored_cells)
+    if result.won or result.lost:
+        save_recording()
+
+    if result.won:
+        game_won_screen()
+    elif result.hit:
+        # Keys pressed during the pause are dropped, as before.
+        pygame.mixer.Sound.play(effect)
+        switch_mode(PAUSED)
+        scheduler.after(HIT_PAUSE, lambda: end_hit_pause(result.lost))
+
+def queue_move(direction):
+    if len(input_queue) < INPUT_QUEUE_LIMIT:
+        input_queue.append(direction)
+
+def play_move(direction):
+    if recording is not None:
+        recording.record(direction)
+    handle_step_result(state.step(direction))
+
+def run_simulation(now):
+    for _ in range(timestep.advance(now)):
+        if mode != PLAYING:
+            break
+        if autopilot is not None and not input_queue:
+            input_queue.append(autopilot.plan())
+        if not input_queue:
+            break
+        play_move(input_queue.popleft())
+    if not input_queue:
+        timestep.rest()
+
+def wait_for_events():
+    # Blocks until something happens, waking up in time for the scheduler,
+    # the next simulation tick while moves are queued and, while it is
+    # shown, the profiler panel's refresh. Returns the event it woke up
+    # for, if any; the rest are fetched by the caller.
+    now = pygame.time.get_ticks()
+    timeouts = []
+    due = scheduler.next_due()
+    if due is not None:
+        timeouts.append(due - now)
+    if profiler_visible:
+        timeouts.append(PROFILER_REFRESH)
+    if input_queue or (autopilot is not None and mode == PLAYING):
+        timeouts.append(timestep.until_next(now))
+    if timeouts:
+        event = pygame.event.wait(max(1, int(min(timeouts))))
+    else:
+        event = pygame.event.wait()
+    return [] if event.type == pygame.NOEVENT else [event]
+
+def draw_if_changed():
+    global drawn_key, frames_drawn
+    key = (state.version, mode)
+    if key == drawn_key and not renderer.full_redraw and not profiler_visible:
+        return
+    draw_screen(player_rect())
+    frames_drawn += 1
+    drawn_key = key
+
+def unchanged_frame_cost(repeat=50):
+    # What a fixed-rate frame costs when nothing has changed: pumping events
+    # and rebuilding the sprite list only for the renderer to find it equal.
+    # The sample frames are kept out of the profiler's phases.
+    profiling = profiler.enabled
+    profiler.enabled = False
+    draw_screen(player_rect())
+    start = time.perf_counter()
+    for _ in range(repeat):
+        pygame.event.pump()
+        draw_screen(player_rect())
+    cost = (time.perf_counter() - start) / repeat
+    profiler.enabled = profiling
+    return cost
+
+def report_idle_redraw(wall_seconds, cpu_seconds):
+    played = playing_seconds
+    if playing_since is not None:
+        played += time.perf_counter() - playing_since
+    skipped = max(0, int(played * FPS) - frames_drawn)
+    print(f"idle redraw: {frames_drawn} frames drawn in {played:.1f} s of play, {skipped} skipped compared with {FPS} fps")
+    if frame_cost is None:
+        saved = "savings n/a (no game was played)"
+    else:
+        saved = f"~{skipped * frame_cost * 1000:.0f} ms saved at {frame_cost * 1e6:.0f} us per skipped frame"
+    print(f"CPU {cpu_seconds:.2f} s over {wall_seconds:.1f} s ({cpu_seconds / wall_seconds * 100 if wall_seconds else 0:.1f}% of one core), {saved}")
+
+def play_recording(replayed, replay_state=None):
+    # Rendered playback for replay.py --render: one recorded move per frame
+    # and none of the live game's pauses, on replay_state's map when given.
+    if replay_state is not None:
+        set_state(replay_state)
+    check_map(replayed, state)
+    pygame.init()
+    clock = pygame.time.Clock()
+    build_background()
+    for recorded_game in replayed.games:
+        patch_background(state.reset())
+        select(state, recorded_game.character)
+        renderer.invalidate()
+        for move in recorded_game.moves:
+            clock.tick(REPLAY_FPS)
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    quit_game()
+            handle_step_result(state.step(move))
+            draw_screen(player_rect())
+    pygame.quit()
+
+def main():
+    global recording, recording_path, profile_trace_path, idle_redraw, session_started, save_path, autopilot
+    parser = argparse.ArgumentParser(description="Star Wars maze game.")
+    parser.add_argument("--record", metavar="FILE", help="record every move to FILE (replay it with replay.py)")
+    parser.add_argument("--profile-trace", metavar="FILE", help="time every frame phase and write a Chrome trace to FILE on exit")
+    parser.add_argument("--save-file", default=save_path, metavar="FILE", help="where F5 saves the game and F9 loads it from")
+    parser.add_argument("--autopilot", nargs="?", const=DEFAULT_BUDGET_MS, type=float, metavar="MS", help=f"let a search play, with MS milliseconds per move (default {DEFAULT_BUDGET_MS})")
+    parser.add_argument("--idle-redraw", action="store_true", help="sleep until input and redraw only when something changed")
+    args = parser.parse_args()
+    idle_redraw = args.idle_redraw
+    save_path = args.save_file
+    if args.autopilot is not None:
+        autopilot = Autopilot(state, args.autopilot)
+    if args.record:
+        recording = Recording(state.map_hash)
+        recording_path = args.record
+    if args.profile_trace:
+        profiler.start_trace()
+        profile_trace_path = args.profile_trace
+
+    pygame.init()
+    clock = pygame.time.Clock()
+    build_background()
+    choose_screen()
+    session_started = (time.perf_counter(), time.process_time())
+
+    while True:
+        if idle_redraw:
+            woken = wait_for_events()
+            frame_start = profiler.start()
+            start = profiler.start()
+            events = woken + pygame.event.get()
+            profiler.stop("events", start)
+        else:
+            clock.tick(FPS)
+            frame_start = profiler.start()
+            start = profiler.start()
+            events = pygame.event.get()
+            profiler.stop("events", start)
+        scheduler.update(pygame.time.get_ticks())
+        for event in events:
+            if event.type == pygame.QUIT:
+                quit_game()
+
+            if event.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE):
+                renderer.invalidate()
+            elif event.type == pygame.KEYDOWN and event.key == PROFILER_KEY:
+                toggle_profiler()
+            elif mode == PLAYING and event.type == pygame.KEYDOWN and event.key == SAVE_KEY:
+                save_game()
+            elif mode in (CHOOSING, PLAYING) and event.type == pygame.KEYDOWN and event.key == LOAD_KEY:
+                load_game()
+            elif mode == CHOOSING and event.type == pygame.MOUSEBUTTONDOWN:
+                handle_choose_click(event.pos)
+            elif mode == PLAYING and autopilot is None and event.type == pygame.KEYDOWN and event.key in KEY_DIRECTIONS:
+                queue_move(KEY_DIRECTIONS[event.key])
+
+        start = profiler.start()
+        run_simulation(pygame.time.get_ticks())
+        profiler.stop("simulation", start)
+
+        if mode in (PLAYING, PAUSED):
+            if idle_redraw:
+                draw_if_changed()
+            else:
+                draw_screen(player_rect())
+        profiler.stop("frame", frame_start)
+
+if __name__ == "__main__":
+    main()
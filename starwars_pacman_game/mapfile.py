@@ -0,0 +1,213 @@
+import hashlib
+import mmap
+import os
+import struct
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Reads config.txt in a single pass and caches the result as a compiled
+# binary map next to it, keyed by the hash of the text. The grid is stored
+# as one byte per cell right after a fixed-size header, so the compiled
+# file can be memory-mapped and large maps skip re-tokenizing entirely.
+#
+# config.txt directives (any order, before or after the grid):
+#   Door:A,X:0,Y:5               a door enemies can spawn at
+#   Start,X:6,Y:5                where the player starts
+#   Goal,X:13,Y:9                the trophy cell
+#   Character:Stormtrooper,Door:C
+# Configs written before doors, start and goal were declared fall back to
+# the classic map's values below.
+
+DOOR_POSITIONS = {
+    "A": (0, 5),
+    "B": (4, 0),
+    "C": (12, 0),
+    "D": (13, 5),
+    "E": (4, 10),
+}
+
+PLAYER_START = (6, 5)
+WINNING_POSITION = (13, 9)
+
+MAGIC = b"SWMAP"
+FORMAT_VERSION = 1
+# magic, version, width, height, start x/y, goal x/y, door count, spawn count
+HEADER = struct.Struct("<5sBIIIIIIII")
+POSITION = struct.Struct("<II")
+LENGTH = struct.Struct("<B")
+
+CACHE_DIR_NAME = "__mapcache__"
+
+class MapData:
+    def __init__(self, grid, doors, spawns, player_start, winning_position, grid_array=None):
+        self.grid = grid
+        self.doors = doors
+        self.spawns = spawns
+        self.player_start = player_start
+        self.winning_position = winning_position
+        # Copy-on-write view of the compiled grid, when loaded from a
+        # compiled map with NumPy available.
+        self.grid_array = grid_array
+        self.width = len(grid[0]) if grid else 0
+        self.height = len(grid)
+        # SHA-256 of the config text this map came from, when loaded
+        # through load_map_data().
+        self.digest = None
+
+def parse_fields(line):
+    fields = {}
+    for part in line.split(","):
+        key, _, value = part.partition(":")
+        fields[key.strip()] = value.strip()
+    return fields
+
+def parse_position(fields, line_number):
+    try:
+        return int(fields["X"]), int(fields["Y"])
+    except (KeyError, ValueError):
+        raise ValueError(f"line {line_number}: expected X:<col>,Y:<row>") from None
+
+def check_position(position, width, height, line_number, name):
+    # line_number is None for a default the config didn't override.
+    x, y = position
+    if not (0 <= x < width and 0 <= y < height):
+        where = f"line {line_number}" if line_number is not None else f"the default {name}"
+        raise ValueError(f"{where}: ({x}, {y}) is outside the {width}x{height} grid")
+
+def parse_config(text):
+    grid = []
+    doors = {}
+    spawn_doors = []
+    player_start = None
+    winning_position = None
+    # Where each door, the start and the goal were declared.
+    lines = {}
+
+    for line_number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line:
+            continue
+        if line[0].isdigit():
+            grid.append([int(x) for x in line.split('\t')])
+            continue
+        fields = parse_fields(line)
+        if "Character" in fields and "Door" in fields:
+            spawn_doors.append((fields["Character"], fields["Door"], line_number))
+        elif "Door" in fields:
+            doors[fields["Door"]] = parse_position(fields, line_number)
+            lines["door " + fields["Door"]] = line_number
+        elif "Start" in fields:
+            player_start = parse_position(fields, line_number)
+            lines["start"] = line_number
+        elif "Goal" in fields:
+            winning_position = parse_position(fields, line_number)
+            lines["goal"] = line_number
+        else:
+            raise ValueError(f"line {line_number}: unrecognised directive {line!r}")
+
+    if not grid or any(len(row) != len(grid[0]) for row in grid):
+        raise ValueError("the map grid is missing or its rows differ in length")
+
+    # Spawns are resolved after the pass so doors can be declared anywhere.
+    doors = doors or dict(DOOR_POSITIONS)
+    player_start = player_start or PLAYER_START
+    winning_position = winning_position or WINNING_POSITION
+    width, height = len(grid[0]), len(grid)
+    positions = [(f"door {label}", position) for label, position in doors.items()]
+    positions += [("start", player_start), ("goal", winning_position)]
+    for name, position in positions:
+        check_position(position, width, height, lines.get(name), name)
+
+    spawns = []
+    for character_info, door, line_number in spawn_doors:
+        if door not in doors:
+            raise ValueError(f"line {line_number}: unknown door {door!r}")
+        spawns.append((character_info, doors[door]))
+
+    return MapData(grid, doors, spawns, player_start, winning_position)
+
+def pack_string(text):
+    data = text.encode("utf-8")
+    return LENGTH.pack(len(data)) + data
+
+def compile_map(map_data):
+    parts = [
+        HEADER.pack(
+            MAGIC, FORMAT_VERSION, map_data.width, map_data.height,
+            *map_data.player_start, *map_data.winning_position,
+            len(map_data.doors), len(map_data.spawns),
+        ),
+        b"".join(bytes(row) for row in map_data.grid),
+    ]
+    for label, position in map_data.doors.items():
+        parts.append(pack_string(label) + POSITION.pack(*position))
+    for character_info, position in map_data.spawns:
+        parts.append(pack_string(character_info) + POSITION.pack(*position))
+    return b"".join(parts)
+
+def read_string(buffer, offset):
+    (length,) = LENGTH.unpack_from(buffer, offset)
+    offset += LENGTH.size
+    return bytes(buffer[offset:offset + length]).decode("utf-8"), offset + length
+
+def read_entries(buffer, offset, count):
+    entries = []
+    for _ in range(count):
+        name, offset = read_string(buffer, offset)
+        entries.append((name, POSITION.unpack_from(buffer, offset)))
+        offset += POSITION.size
+    return entries, offset
+
+def load_compiled(path):
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        if len(buffer) < HEADER.size:
+            raise ValueError(f"{path} is not a compiled map")
+        magic, version, width, height, start_x, start_y, goal_x, goal_y, door_count, spawn_count = HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a compiled map (version {FORMAT_VERSION})")
+
+        offset = HEADER.size
+        grid = [list(buffer[offset + row * width:offset + (row + 1) * width]) for row in range(height)]
+        offset += width * height
+        doors, offset = read_entries(buffer, offset, door_count)
+        spawns, offset = read_entries(buffer, offset, spawn_count)
+
+    grid_array = None
+    if numpy is not None:
+        grid_array = numpy.memmap(path, dtype=numpy.uint8, mode="c", offset=HEADER.size, shape=(height, width))
+    return MapData(grid, dict(doors), spawns, (start_x, start_y), (goal_x, goal_y), grid_array)
+
+def cache_path(config_path, digest, cache_dir=None, extension="map"):
+    cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(config_path)), CACHE_DIR_NAME)
+    name = os.path.splitext(os.path.basename(config_path))[0]
+    return os.path.join(cache_dir, f"{name}-{digest[:16]}.{extension}")
+
+def load_map_data(config_path, cache_dir=None):
+    with open(config_path, "rb") as file:
+        raw = file.read()
+    digest = hashlib.sha256(raw).hexdigest()
+    compiled_path = cache_path(config_path, digest, cache_dir)
+
+    try:
+        map_data = load_compiled(compiled_path)
+        map_data.digest = digest
+        return map_data
+    except (OSError, ValueError, struct.error):
+        pass
+
+    map_data = parse_config(raw.decode("utf-8"))
+    map_data.digest = digest
+    # The cache is only an optimisation: a read-only install (e.g. the
+    # frozen build) just parses the text every time.
+    try:
+        os.makedirs(os.path.dirname(compiled_path), exist_ok=True)
+        temporary_path = f"{compiled_path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(compile_map(map_data))
+        os.replace(temporary_path, compiled_path)
+    except OSError:
+        pass
+    return map_data
@@ -0,0 +1,261 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import time
+from array import array
+from collections import deque
+
+from mapfile import cache_path, load_map_data
+from pathfinding import NEIGHBOR_OFFSETS, STEP_OFFSETS, UNREACHABLE, FlowField, distance_array, grid_to_array, numpy
+
+# All-pairs next-hop tables for maps whose walls never change, i.e. maps
+# without Darth Vaders. For every pair of open cells the table holds the
+# direction of the first step from one towards the other, picked exactly
+# like FlowField.next_step picks it, so enemy moves become lookups instead
+# of searches. Building one is an explicit, optional step (run this module)
+# because it costs a BFS per open cell and (open cells)^2 / 4 bytes; the
+# report it prints is there to decide per map whether that is worth it.
+#
+# Layout (little-endian), stored in the map cache next to the compiled map:
+#   header:     magic, version, config SHA-256, width, height, open cells
+#   cells:      uint32 y * width + x of every open cell, ascending
+#   components: uint32 connected-component id per open cell
+#   rows:       per target cell, 2 bits per source cell (left, right, up,
+#               down), four to a byte
+
+MAGIC = b"SWHOP"
+# Version 2 picks steps in STEP_OFFSETS order.
+FORMAT_VERSION = 2
+HEADER = struct.Struct("<5sB32sIII")
+
+def table_path(config_path, digest, cache_dir=None):
+    return cache_path(config_path, digest, cache_dir, extension="hops")
+
+def open_cells(grid):
+    width = len(grid[0])
+    return [y * width + x for y, row in enumerate(grid) for x, value in enumerate(row) if value == 1]
+
+def label_components(grid, cells):
+    width, height = len(grid[0]), len(grid)
+    labels = {}
+    label = 0
+    for cell in cells:
+        if cell in labels:
+            continue
+        label += 1
+        labels[cell] = label
+        queue = deque([cell])
+        while queue:
+            current = queue.popleft()
+            x, y = current % width, current // width
+            for dx, dy in NEIGHBOR_OFFSETS:
+                nx, ny = x + dx, y + dy
+                neighbor = ny * width + nx
+                if 0 <= nx < width and 0 <= ny < height and grid[ny][nx] == 1 and neighbor not in labels:
+                    labels[neighbor] = label
+                    queue.append(neighbor)
+    return [labels[cell] for cell in cells]
+
+def pack_codes(codes, row_size):
+    packed = bytearray(row_size)
+    for i, code in enumerate(codes):
+        packed[i >> 2] |= code << ((i & 3) * 2)
+    return bytes(packed)
+
+def build_rows(grid, cells):
+    # One row per target: the BFS distances from it, then for every source
+    # the first neighbour one step closer.
+    width = len(grid[0])
+    row_size = (len(cells) + 3) // 4
+    if numpy is None:
+        for target in cells:
+            field = FlowField(grid, (target % width, target // width))
+            codes = []
+            for cell in cells:
+                x, y = cell % width, cell // width
+                code = 0
+                if field.distance(x, y) > 0:
+                    nx, ny = field.next_step(x, y)
+                    code = NEIGHBOR_OFFSETS.index((nx - x, ny - y))
+                codes.append(code)
+            yield pack_codes(codes, row_size)
+        return
+
+    grid_array = grid_to_array(grid)
+    height = len(grid)
+    cell_array = numpy.array(cells, dtype=numpy.int64)
+    xs, ys = cell_array % width + 1, cell_array // width + 1
+    padded = numpy.full((height + 2, width + 2), UNREACHABLE, dtype=numpy.int32)
+    codes = numpy.zeros(row_size * 4, dtype=numpy.uint8)
+    for target in cells:
+        padded[1:-1, 1:-1] = distance_array(grid_array, (target % width, target // width))
+        current = padded[ys, xs]
+        found = current <= 0
+        codes[:] = 0
+        for dx, dy in STEP_OFFSETS:
+            hit = ~found & (padded[ys + dy, xs + dx] == current - 1)
+            codes[:len(cells)][hit] = NEIGHBOR_OFFSETS.index((dx, dy))
+            found |= hit
+        yield (codes[0::4] | codes[1::4] << 2 | codes[2::4] << 4 | codes[3::4] << 6).tobytes()
+
+class NextHopTable:
+    def __init__(self, width, height, cells, components, rows, digest=None):
+        self.width = width
+        self.height = height
+        self.cells = cells
+        self.components = components
+        # Packed rows, as bytes or a read-only memory map of the file.
+        self.rows = rows
+        self.row_size = (len(cells) + 3) // 4
+        self.digest = digest
+        # Cell -> position in `cells`, or -1 for walls.
+        self.index = array("i", [-1]) * (width * height)
+        for i, cell in enumerate(cells):
+            self.index[cell] = i
+
+    @classmethod
+    def build(cls, grid, digest=None):
+        cells = open_cells(grid)
+        return cls(len(grid[0]), len(grid), array("I", cells), array("I", label_components(grid, cells)), b"".join(build_rows(grid, cells)), digest)
+
+    def to_bytes(self):
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, bytes.fromhex(self.digest or "0" * 64), self.width, self.height, len(self.cells))
+        return header + self.cells.tobytes() + self.components.tobytes() + bytes(self.rows)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(self.to_bytes())
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path, digest=None):
+        # The rows stay on disk and are paged in as enemies look them up.
+        with open(path, "rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(buffer) < HEADER.size:
+            raise ValueError(f"{path} is not a next-hop table")
+        magic, version, stored_digest, width, height, count = HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a next-hop table (version {FORMAT_VERSION})")
+        if digest is not None and stored_digest.hex() != digest:
+            raise ValueError(f"{path} was built for a different config")
+        if len(buffer) != HEADER.size + count * 8 + count * ((count + 3) // 4):
+            raise ValueError(f"{path} is truncated")
+        offset = HEADER.size
+        cells = array("I", buffer[offset:offset + count * 4])
+        components = array("I", buffer[offset + count * 4:offset + count * 8])
+        return cls(width, height, cells, components, memoryview(buffer)[offset + count * 8:], stored_digest.hex())
+
+    def field(self, target):
+        # A FlowField stand-in for `target`, or None when it isn't an open
+        # cell (the table only covers open cells).
+        x, y = target
+        if not (0 <= x < self.width and 0 <= y < self.height) or self.index[y * self.width + x] < 0:
+            return None
+        return TableField(self, target)
+
+class TableField(FlowField):
+    def __init__(self, table, target):
+        self.width = table.width
+        self.height = table.height
+        self.target = target
+        self.ignore_walls = False
+        self.distances = None
+        self.table = table
+        self.index = table.index
+        self.components = table.components
+        self.rows = table.rows
+        self.target_index = table.index[target[1] * table.width + target[0]]
+        self.component = table.components[self.target_index]
+        self.row = self.target_index * table.row_size
+
+    def next_step(self, x, y, steps=1):
+        source = self.index[y * self.width + x]
+        if source < 0 or source == self.target_index or self.components[source] != self.component:
+            return x, y
+        dx, dy = NEIGHBOR_OFFSETS[(self.rows[self.row + (source >> 2)] >> ((source & 3) << 1)) & 3]
+        if steps == 1:
+            return x + dx, y + dy
+        return self.next_step(x + dx, y + dy, steps - 1)
+
+    def distance(self, x, y):
+        # Hops counted along the table; fine for the occasional path query.
+        source = self.index[y * self.width + x]
+        if (x, y) != self.target and (source < 0 or self.components[source] != self.component):
+            return UNREACHABLE
+        hops = 0
+        while (x, y) != self.target:
+            x, y = self.next_step(x, y)
+            hops += 1
+        return hops
+
+    def open_cell(self, grid, x, y):
+        # Never reached: the cache stops handing out table fields once the
+        # grid differs from the one the table was built for.
+        pass
+
+    def close_cells(self, grid, cells):
+        pass
+
+def load_table(config_path, digest, cache_dir=None):
+    # The map's table if one has been built, else None.
+    try:
+        return NextHopTable.load(table_path(config_path, digest, cache_dir), digest)
+    except (OSError, ValueError, struct.error):
+        return None
+
+def time_lookups(fields, sources):
+    start = time.perf_counter()
+    for field in fields:
+        for x, y in sources:
+            field.next_step(x, y)
+    return (time.perf_counter() - start) / (len(fields) * len(sources))
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the all-pairs next-hop table for a map without Darth Vaders.")
+    parser.add_argument("--config", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.txt"))
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    map_data = load_map_data(args.config)
+    start = time.perf_counter()
+    table = NextHopTable.build(map_data.grid, map_data.digest)
+    precompute = time.perf_counter() - start
+    path = table_path(args.config, map_data.digest)
+    table.save(path)
+    table = NextHopTable.load(path, map_data.digest)
+
+    # Same sources and targets for every method; at most 64 x 256 pairs.
+    width = table.width
+    cells = [(cell % width, cell // width) for cell in table.cells]
+    targets, sources = cells[::max(1, len(cells) // 64)], cells[::max(1, len(cells) // 256)]
+    # Without the table every player move costs a BFS before enemies can
+    # look their steps up in it.
+    start = time.perf_counter()
+    flow_fields = [FlowField(map_data.grid, target) for target in targets]
+    bfs = (time.perf_counter() - start) / len(targets)
+    report = {
+        "open_cells": len(cells),
+        "precompute_ms": precompute * 1000,
+        "file_bytes": os.path.getsize(path),
+        "path": path,
+        "has_vaders": any(character_info == "Darthvader" for character_info, _ in map_data.spawns),
+        "table_lookup_ns": time_lookups([table.field(target) for target in targets], sources) * 1e9,
+        "flow_field_lookup_ns": time_lookups(flow_fields, sources) * 1e9,
+        "flow_field_bfs_ms": bfs * 1000,
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['open_cells']} open cells, table built in {report['precompute_ms']:.1f} ms, {report['file_bytes']} bytes at {path}")
+    print(f"next step from the table: {report['table_lookup_ns']:.0f} ns")
+    print(f"without it: {report['flow_field_bfs_ms']:.3f} ms BFS per player move, then {report['flow_field_lookup_ns']:.0f} ns per next step")
+    if report["has_vaders"]:
+        print("this map has Darth Vaders, so its walls change and the game won't use the table")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+NO_ENTITY = -1
+
+class OccupancyIndex:
+    # Cell -> ids of the entities standing on it, kept up to date as they
+    # move, so "who is on this cell" costs the same with four enemies or
+    # forty thousand. Each cell holds the head of an intrusive linked list
+    # threaded through per-entity next/previous arrays, so the whole index
+    # is a few flat typed arrays: 4 bytes per cell, 16 per entity. Entity
+    # ids must be small consecutive integers.
+    def __init__(self, width, height):
+        self.width = width
+        self.head = array("i", [NO_ENTITY]) * (width * height)
+        self.next_id = array("i")
+        self.previous_id = array("i")
+        # Cell each entity started the current turn on, valid when its
+        # moved_turn equals turn; used to catch entities swapping cells.
+        self.origin = array("i")
+        self.moved_turn = array("i")
+        self.turn = 1
+
+    def _cell(self, position):
+        return position[1] * self.width + position[0]
+
+    def _link(self, entity_id, cell):
+        first = self.head[cell]
+        self.next_id[entity_id] = first
+        self.previous_id[entity_id] = NO_ENTITY
+        if first != NO_ENTITY:
+            self.previous_id[first] = entity_id
+        self.head[cell] = entity_id
+
+    def _unlink(self, entity_id, cell):
+        previous_id, next_id = self.previous_id[entity_id], self.next_id[entity_id]
+        if previous_id != NO_ENTITY:
+            self.next_id[previous_id] = next_id
+        else:
+            self.head[cell] = next_id
+        if next_id != NO_ENTITY:
+            self.previous_id[next_id] = previous_id
+
+    def add(self, entity_id, position):
+        while len(self.next_id) <= entity_id:
+            for ids in (self.next_id, self.previous_id, self.origin, self.moved_turn):
+                ids.append(NO_ENTITY)
+        self._link(entity_id, self._cell(position))
+
+    def remove(self, entity_id, position):
+        self._unlink(entity_id, self._cell(position))
+        self.next_id[entity_id] = self.previous_id[entity_id] = NO_ENTITY
+
+    def move(self, entity_id, old_position, position):
+        # _unlink and _link written out inline: this runs for every enemy
+        # on every turn.
+        if old_position == position:
+            return
+        width, head, next_ids, previous_ids = self.width, self.head, self.next_id, self.previous_id
+        old_cell = old_position[1] * width + old_position[0]
+        previous_id, next_id = previous_ids[entity_id], next_ids[entity_id]
+        if previous_id != NO_ENTITY:
+            next_ids[previous_id] = next_id
+        else:
+            head[old_cell] = next_id
+        if next_id != NO_ENTITY:
+            previous_ids[next_id] = previous_id
+
+        cell = position[1] * width + position[0]
+        first = head[cell]
+        next_ids[entity_id] = first
+        previous_ids[entity_id] = NO_ENTITY
+        if first != NO_ENTITY:
+            previous_ids[first] = entity_id
+        head[cell] = entity_id
+
+        # Keep where the entity started the turn, not its last hop.
+        if self.moved_turn[entity_id] != self.turn:
+            self.moved_turn[entity_id] = self.turn
+            self.origin[entity_id] = old_cell
+
+    def move_all(self, old_cells, cells):
+        # NumPy version of move() for every entity at once: old_cells and
+        # cells are flat cell indices (y * width + x) for ids 0..n-1, and
+        # every id must be in the index. The per-cell lists are rebuilt by
+        # sorting the ids by cell.
+        head = numpy.frombuffer(self.head, dtype=numpy.intc)
+        next_ids = numpy.frombuffer(self.next_id, dtype=numpy.intc)
+        previous_ids = numpy.frombuffer(self.previous_id, dtype=numpy.intc)
+        origin = numpy.frombuffer(self.origin, dtype=numpy.intc)
+        moved_turn = numpy.frombuffer(self.moved_turn, dtype=numpy.intc)
+
+        head[old_cells] = NO_ENTITY
+        order = numpy.argsort(cells, kind="stable")
+        sorted_cells = cells[order]
+        first = numpy.ones(order.size, dtype=bool)
+        first[1:] = sorted_cells[1:] != sorted_cells[:-1]
+        last = numpy.roll(first, -1)
+        next_ids[order] = numpy.where(last, NO_ENTITY, numpy.roll(order, -1))
+        previous_ids[order] = numpy.where(first, NO_ENTITY, numpy.roll(order, 1))
+        head[sorted_cells[first]] = order[first]
+
+        moved = (cells != old_cells) & (moved_turn != self.turn)
+        origin[moved] = old_cells[moved]
+        moved_turn[moved] = self.turn
+
+    def begin_turn(self):
+        self.turn += 1
+
+    def relink(self, old_xs, old_ys, xs, ys):
+        # Files every entity under its cell in xs/ys after the positions
+        # were overwritten wholesale (a reset or a restore). Only the cells
+        # in old_xs/old_ys are emptied, so this costs O(entities), not
+        # O(cells). Every id must be in the index.
+        width, head, next_ids, previous_ids = self.width, self.head, self.next_id, self.previous_id
+        for x, y in zip(old_xs, old_ys):
+            head[y * width + x] = NO_ENTITY
+        # _link written out inline, like in move().
+        for entity_id, (x, y) in enumerate(zip(xs, ys)):
+            cell = y * width + x
+            first = head[cell]
+            next_ids[entity_id] = first
+            previous_ids[entity_id] = NO_ENTITY
+            if first != NO_ENTITY:
+                previous_ids[first] = entity_id
+            head[cell] = entity_id
+        self.turn += 1
+
+    def at(self, position):
+        occupants = []
+        entity_id = self.head[self._cell(position)]
+        while entity_id != NO_ENTITY:
+            occupants.append(entity_id)
+            entity_id = self.next_id[entity_id]
+        return occupants
+
+    def occupied(self, position):
+        return self.head[self._cell(position)] != NO_ENTITY
+
+    def crossed(self, old_position, new_position):
+        # Entities that went from new_position to old_position this turn,
+        # i.e. swapped cells with something that moved the other way.
+        new_cell = self._cell(new_position)
+        return [
+            entity_id for entity_id in self.at(old_position)
+            if self.moved_turn[entity_id] == self.turn and self.origin[entity_id] == new_cell
+        ]
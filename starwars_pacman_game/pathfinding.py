@@ -0,0 +1,734 @@
+import heapq
+from collections import OrderedDict, deque
+from operator import itemgetter
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Left, right, up, down: the order searches expand neighbours in.
+NEIGHBOR_OFFSETS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+# The order a step is picked in when several neighbours are one closer to
+# the target: down, up, right, left. The old per-enemy BFS overwrote a
+# cell's parent every time it saw the cell again, so the path it returned
+# was the one whose moves come latest in NEIGHBOR_OFFSETS at every step,
+# and picking the first closer neighbour in this order reproduces it.
+STEP_OFFSETS = ((0, 1), (0, -1), (1, 0), (-1, 0))
+
+UNREACHABLE = -1
+
+# Below this many cells the pure-Python BFS is already fast enough that the
+# per-level NumPy call overhead doesn't pay off.
+ARRAY_BACKEND_MIN_CELLS = 10000
+
+# From this many cells on, a BFS over the whole map every time the player
+# moves is too slow, and enemies use the hierarchical pathfinder instead,
+# unless there are so many of them that its searches end up covering the
+# map anyway.
+HIERARCHICAL_MIN_CELLS = 1000000
+HIERARCHICAL_MAX_ENEMIES = 8
+CLUSTER_SIZE = 16
+# Border openings at least this long get an entrance at each end instead of
+# one in the middle.
+LONG_ENTRANCE = 6
+
+class FlowField:
+    # Reverse BFS from the target cell. Every enemy walks "downhill" on the
+    # same field, so one search per turn serves any number of enemies.
+    uses_grid_array = False
+    uses_clusters = False
+
+    def __init__(self, grid, target, ignore_walls=False):
+        self.width = len(grid[0])
+        self.height = len(grid)
+        self.target = target
+        self.ignore_walls = ignore_walls
+        self.distances = None
+        if not ignore_walls:
+            self.distances = self._bfs(grid)
+
+    def _bfs(self, grid):
+        width, height = self.width, self.height
+        distances = [UNREACHABLE] * (width * height)
+        target_x, target_y = self.target
+        distances[target_y * width + target_x] = 0
+        # Like the per-enemy BFS, nothing can step onto a target in a wall.
+        if grid[target_y][target_x] != 1:
+            return distances
+        queue = deque([self.target])
+
+        while queue:
+            x, y = queue.popleft()
+            next_distance = distances[y * width + x] + 1
+            for dx, dy in NEIGHBOR_OFFSETS:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < width and 0 <= ny < height and grid[ny][nx] == 1:
+                    index = ny * width + nx
+                    if distances[index] == UNREACHABLE:
+                        distances[index] = next_distance
+                        queue.append((nx, ny))
+        return distances
+
+    def _passable(self, grid, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height and grid[y][x] == 1
+
+    def open_cell(self, grid, x, y):
+        # A wall turned into a path: distances can only shrink, and only
+        # around the opened cell, so relax outward from it.
+        if self.ignore_walls:
+            return
+        if (x, y) == self.target:
+            self.distances = self._bfs(grid)
+            return
+        width, distances = self.width, self.distances
+        best = UNREACHABLE
+        for dx, dy in NEIGHBOR_OFFSETS:
+            nx, ny = x + dx, y + dy
+            if self._passable(grid, nx, ny):
+                neighbor_distance = distances[ny * width + nx]
+                if neighbor_distance != UNREACHABLE and (best == UNREACHABLE or neighbor_distance < best):
+                    best = neighbor_distance
+        if best == UNREACHABLE:
+            return
+
+        distances[y * width + x] = best + 1
+        queue = deque([(x, y)])
+        while queue:
+            cx, cy = queue.popleft()
+            next_distance = distances[cy * width + cx] + 1
+            for dx, dy in NEIGHBOR_OFFSETS:
+                nx, ny = cx + dx, cy + dy
+                if self._passable(grid, nx, ny):
+                    index = ny * width + nx
+                    if distances[index] == UNREACHABLE or distances[index] > next_distance:
+                        distances[index] = next_distance
+                        queue.append((nx, ny))
+
+    def close_cells(self, grid, cells):
+        # Paths turned back into walls: distances can only grow. Find the
+        # cells whose every shortest route ran through a closed cell, then
+        # re-grow just that region from its unaffected border.
+        if self.ignore_walls:
+            return
+        if self.target in cells:
+            self.distances = self._bfs(grid)
+            return
+        width, distances = self.width, self.distances
+
+        affected = set()
+        heap = []
+        for x, y in cells:
+            affected.add((x, y))
+            if distances[y * width + x] != UNREACHABLE:
+                heapq.heappush(heap, (distances[y * width + x], x, y))
+
+        while heap:
+            distance, x, y = heapq.heappop(heap)
+            for dx, dy in NEIGHBOR_OFFSETS:
+                nx, ny = x + dx, y + dy
+                if (nx, ny) in affected or not self._passable(grid, nx, ny):
+                    continue
+                if distances[ny * width + nx] != distance + 1:
+                    continue
+                if not self._has_parent(grid, nx, ny, affected):
+                    affected.add((nx, ny))
+                    heapq.heappush(heap, (distance + 1, nx, ny))
+
+        for x, y in affected:
+            distances[y * width + x] = UNREACHABLE
+
+        for x, y in affected:
+            if not self._passable(grid, x, y):
+                continue
+            for dx, dy in NEIGHBOR_OFFSETS:
+                nx, ny = x + dx, y + dy
+                if (nx, ny) not in affected and self._passable(grid, nx, ny) and distances[ny * width + nx] != UNREACHABLE:
+                    heapq.heappush(heap, (distances[ny * width + nx] + 1, x, y))
+
+        while heap:
+            distance, x, y = heapq.heappop(heap)
+            index = y * width + x
+            if distances[index] != UNREACHABLE and distances[index] <= distance:
+                continue
+            distances[index] = distance
+            for dx, dy in NEIGHBOR_OFFSETS:
+                nx, ny = x + dx, y + dy
+                if (nx, ny) in affected and self._passable(grid, nx, ny):
+                    neighbor_distance = distances[ny * width + nx]
+                    if neighbor_distance == UNREACHABLE or neighbor_distance > distance + 1:
+                        heapq.heappush(heap, (distance + 1, nx, ny))
+
+    def _has_parent(self, grid, x, y, affected):
+        parent_distance = self.distances[y * self.width + x] - 1
+        for dx, dy in NEIGHBOR_OFFSETS:
+            nx, ny = x + dx, y + dy
+            if (nx, ny) not in affected and self._passable(grid, nx, ny) and self.distances[ny * self.width + nx] == parent_distance:
+                return True
+        return False
+
+    def distance(self, x, y):
+        if self.ignore_walls:
+            # Without walls the BFS distance is just the Manhattan distance.
+            return abs(x - self.target[0]) + abs(y - self.target[1])
+        return self.distances[y * self.width + x]
+
+    def next_step(self, x, y, steps=1):
+        for _ in range(steps):
+            current = self.distance(x, y)
+            if current <= 0:
+                break
+            for dx, dy in STEP_OFFSETS:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < self.width and 0 <= ny < self.height and self.distance(nx, ny) == current - 1:
+                    x, y = nx, ny
+                    break
+        return x, y
+
+    def path_from(self, x, y, inside=None):
+        # With inside, the path stops before the first cell it rejects, so
+        # callers that only show part of the map don't walk the rest.
+        if self.distance(x, y) == UNREACHABLE:
+            return []
+        path = [(x, y)]
+        while (x, y) != self.target:
+            x, y = self.next_step(x, y)
+            if inside is not None and not inside(x, y):
+                break
+            path.append((x, y))
+        return path
+
+def grid_to_array(grid):
+    return numpy.array(grid, dtype=numpy.uint8)
+
+def distance_array(grid_array, target):
+    # Level-synchronous BFS: the whole frontier is expanded with one set of
+    # array operations per distance level. The grid is padded with a wall
+    # border so neighbour indices never need bounds checks.
+    height, width = grid_array.shape
+    padded_width = width + 2
+    passable = numpy.zeros((height + 2, padded_width), dtype=bool)
+    passable[1:-1, 1:-1] = grid_array == 1
+    passable = passable.ravel()
+
+    distances = numpy.full(passable.shape, UNREACHABLE, dtype=numpy.int32)
+    target_x, target_y = target
+    start = (target_y + 1) * padded_width + target_x + 1
+    distances[start] = 0
+    if not passable[start]:
+        return distances.reshape(height + 2, padded_width)[1:-1, 1:-1]
+
+    offsets = numpy.array([-1, 1, -padded_width, padded_width])
+    unvisited = passable.copy()
+    unvisited[start] = False
+    # Scratch array used to drop duplicate neighbours without sorting.
+    slots = numpy.zeros(passable.shape, dtype=numpy.intp)
+    frontier = numpy.array([start])
+    distance = 0
+    while frontier.size:
+        distance += 1
+        neighbors = (frontier[:, None] + offsets).ravel()
+        neighbors = neighbors[unvisited[neighbors]]
+        unvisited[neighbors] = False
+        order = numpy.arange(neighbors.size)
+        slots[neighbors] = order
+        neighbors = neighbors[slots[neighbors] == order]
+        distances[neighbors] = distance
+        frontier = neighbors
+
+    return distances.reshape(height + 2, padded_width)[1:-1, 1:-1]
+
+def gather(values, indices):
+    # values[i] for every i in a NumPy index array, looked up in C.
+    if indices.size == 0:
+        return numpy.empty(0, dtype=numpy.int64)
+    if indices.size == 1:
+        return numpy.array([values[int(indices[0])]], dtype=numpy.int64)
+    return numpy.array(itemgetter(*indices.tolist())(values), dtype=numpy.int64)
+
+def next_steps_array(field, xs, ys, steps=1):
+    # FlowField.next_step for a whole array of cells at once, with the same
+    # neighbour order and tie-breaks.
+    width, height = field.width, field.height
+    xs, ys = xs.astype(numpy.int64), ys.astype(numpy.int64)
+    for _ in range(steps):
+        if field.ignore_walls:
+            # Manhattan field: the first neighbour one closer is down or up
+            # while the row differs, then right or left.
+            target_x, target_y = field.target
+            dy = numpy.sign(target_y - ys)
+            dx = numpy.where(dy == 0, numpy.sign(target_x - xs), 0)
+            xs, ys = xs + dx, ys + dy
+            continue
+        if field.distances is None:
+            # No distance table to index (HierarchicalField): ask the field
+            # once per distinct cell.
+            cells = list(zip(xs.tolist(), ys.tolist()))
+            moves = {}
+            for cell in cells:
+                if cell not in moves:
+                    moves[cell] = field.next_step(*cell)
+            xs = numpy.array([moves[cell][0] for cell in cells], dtype=numpy.int64)
+            ys = numpy.array([moves[cell][1] for cell in cells], dtype=numpy.int64)
+            continue
+
+        current = gather(field.distances, ys * width + xs)
+        new_xs, new_ys = xs.copy(), ys.copy()
+        pending = current > 0
+        for dx, dy in STEP_OFFSETS:
+            nx, ny = xs + dx, ys + dy
+            inside = pending & (nx >= 0) & (nx < width) & (ny >= 0) & (ny < height)
+            neighbor = numpy.full(xs.shape, UNREACHABLE, dtype=numpy.int64)
+            neighbor[inside] = gather(field.distances, (ny * width + nx)[inside])
+            found = inside & (neighbor == current - 1)
+            new_xs[found], new_ys[found] = nx[found], ny[found]
+            pending &= ~found
+        xs, ys = new_xs, new_ys
+    return xs, ys
+
+class ArrayFlowField(FlowField):
+    # Same distances as FlowField, computed with NumPy. Lookups and repairs
+    # still go through the inherited list-based code, so moves and paths are
+    # identical between the two backends.
+    uses_grid_array = True
+
+    def __init__(self, grid, target, ignore_walls=False, grid_array=None):
+        self.grid_array = grid_array
+        super().__init__(grid, target, ignore_walls)
+
+    def _bfs(self, grid):
+        grid_array = self.grid_array if self.grid_array is not None else grid_to_array(grid)
+        return distance_array(grid_array, self.target).ravel().tolist()
+
+    def as_array(self):
+        return numpy.array(self.distances, dtype=numpy.int32).reshape(self.height, self.width)
+
+class Cluster:
+    def __init__(self, x0, y0, width, height):
+        self.x0 = x0
+        self.y0 = y0
+        self.width = width
+        self.height = height
+        # Entrance cells in the order they were found, the cells across the
+        # border each one leads to, and (built on first use) each one's
+        # distances to every cell of the cluster without leaving it and its
+        # edges in the entrance graph.
+        self.entrances = []
+        self.partners = {}
+        self.tables = {}
+        self.edges = {}
+
+    def local(self, x, y):
+        return (y - self.y0) * self.width + (x - self.x0)
+
+    def contains(self, x, y):
+        return self.x0 <= x < self.x0 + self.width and self.y0 <= y < self.y0 + self.height
+
+    def distance_to(self, x, y):
+        # Manhattan distance from (x, y) to the nearest cell of the cluster.
+        dx = max(self.x0 - x, 0, x - (self.x0 + self.width - 1))
+        dy = max(self.y0 - y, 0, y - (self.y0 + self.height - 1))
+        return dx + dy
+
+class ClusterGraph:
+    # HPA*-style abstraction of the grid: square clusters, entrances where
+    # passable cells face each other across a cluster border, and per
+    # entrance the in-cluster distances to every cell. Clusters are built
+    # the first time a search reaches them and dropped when a cell inside
+    # them, or on a border they share, changes.
+    def __init__(self, grid, cluster_size=CLUSTER_SIZE):
+        self.grid = grid
+        self.width = len(grid[0])
+        self.height = len(grid)
+        self.cluster_size = cluster_size
+        self.clusters = {}
+        # Bumped on every refresh so fields know their searches are stale.
+        self.version = 0
+        self.builds = 0
+
+    def cluster_key(self, x, y):
+        return x // self.cluster_size, y // self.cluster_size
+
+    def cluster(self, key):
+        cluster = self.clusters.get(key)
+        if cluster is None:
+            cluster = self.clusters[key] = self._build(key)
+        return cluster
+
+    def cluster_at(self, x, y):
+        return self.cluster((x // self.cluster_size, y // self.cluster_size))
+
+    def _border(self, cluster_x, cluster_y, horizontal):
+        # Entrances between a cluster and its neighbour to the right
+        # (horizontal) or below, as (this side, other side) pairs: one per
+        # run of facing passable cells, or one at each end of a long run.
+        size, grid = self.cluster_size, self.grid
+        if horizontal:
+            x = (cluster_x + 1) * size - 1
+            if x + 1 >= self.width:
+                return []
+            facing = [((x, y), (x + 1, y)) for y in range(cluster_y * size, min((cluster_y + 1) * size, self.height))]
+        else:
+            y = (cluster_y + 1) * size - 1
+            if y + 1 >= self.height:
+                return []
+            facing = [((x, y), (x, y + 1)) for x in range(cluster_x * size, min((cluster_x + 1) * size, self.width))]
+
+        entrances = []
+        run = []
+        for pair in facing + [None]:
+            if pair is not None:
+                (x, y), (other_x, other_y) = pair
+                if grid[y][x] == 1 and grid[other_y][other_x] == 1:
+                    run.append(pair)
+                    continue
+            if len(run) >= LONG_ENTRANCE:
+                entrances += [run[0], run[-1]]
+            elif run:
+                entrances.append(run[len(run) // 2])
+            run = []
+        return entrances
+
+    def _build(self, key):
+        cluster_x, cluster_y = key
+        size = self.cluster_size
+        x0, y0 = cluster_x * size, cluster_y * size
+        cluster = Cluster(x0, y0, min(size, self.width - x0), min(size, self.height - y0))
+
+        pairs = self._border(cluster_x, cluster_y, True) + self._border(cluster_x, cluster_y, False)
+        if cluster_x > 0:
+            pairs += [(inside, across) for across, inside in self._border(cluster_x - 1, cluster_y, True)]
+        if cluster_y > 0:
+            pairs += [(inside, across) for across, inside in self._border(cluster_x, cluster_y - 1, False)]
+        for inside, across in pairs:
+            if inside not in cluster.partners:
+                cluster.entrances.append(inside)
+                cluster.partners[inside] = []
+            cluster.partners[inside].append(across)
+        self.builds += 1
+        return cluster
+
+    def table(self, cluster, entrance):
+        table = cluster.tables.get(entrance)
+        if table is None:
+            table = cluster.tables[entrance] = self.local_distances(cluster, *entrance)
+        return table
+
+    def edges(self, cluster, entrance):
+        # (entrance, distance) pairs one hop away: across the border, or
+        # through the cluster.
+        edges = cluster.edges.get(entrance)
+        if edges is None:
+            table = self.table(cluster, entrance)
+            edges = [(across, 1) for across in cluster.partners[entrance]]
+            for other in cluster.entrances:
+                distance = table[cluster.local(*other)]
+                if other != entrance and distance != UNREACHABLE:
+                    edges.append((other, distance))
+            cluster.edges[entrance] = edges
+        return edges
+
+    def local_distances(self, area, x, y):
+        # BFS from (x, y) that never leaves the area. It runs on the area
+        # padded with a wall border, so neighbours need no bounds checks.
+        width, height = area.width, area.height
+        padded_width = width + 2
+        passable = [0] * padded_width
+        for row in self.grid[area.y0:area.y0 + height]:
+            passable.append(0)
+            passable += row[area.x0:area.x0 + width]
+            passable.append(0)
+        passable += [0] * padded_width
+
+        distances = [UNREACHABLE] * len(passable)
+        start = (y - area.y0 + 1) * padded_width + (x - area.x0 + 1)
+        distances[start] = 0
+        if passable[start] == 1:
+            queue = [start]
+            for index in queue:
+                next_distance = distances[index] + 1
+                for neighbor in (index - 1, index + 1, index - padded_width, index + padded_width):
+                    if passable[neighbor] == 1 and distances[neighbor] == UNREACHABLE:
+                        distances[neighbor] = next_distance
+                        queue.append(neighbor)
+        return [value for row in range(1, height + 1) for value in distances[row * padded_width + 1:row * padded_width + 1 + width]]
+
+    def refresh(self, x, y):
+        # (x, y) opened or closed. Its cluster's tables are stale, and so is
+        # a neighbour's when the cell sits on the border they share, since
+        # the entrances there may have moved. Everything else is kept.
+        size = self.cluster_size
+        cluster_x, cluster_y = self.cluster_key(x, y)
+        stale = [(cluster_x, cluster_y)]
+        if x % size == 0:
+            stale.append((cluster_x - 1, cluster_y))
+        if x % size == size - 1:
+            stale.append((cluster_x + 1, cluster_y))
+        if y % size == 0:
+            stale.append((cluster_x, cluster_y - 1))
+        if y % size == size - 1:
+            stale.append((cluster_x, cluster_y + 1))
+        for key in stale:
+            self.clusters.pop(key, None)
+        self.version += 1
+
+class HierarchicalField(FlowField):
+    # Distances to the target over a ClusterGraph. A cell's distance is the
+    # best "in-cluster distance to an entrance + that entrance's distance to
+    # the target", and entrance distances come from an A* search over the
+    # entrance graph that starts at the target and is aimed at whichever
+    # cluster is being asked about, so it only explores a corridor towards
+    # each enemy rather than the whole map. Settled entrances keep their
+    # (exact) distances for later queries until the target or the walls
+    # change. Next steps are refined from those directly, without building
+    # whole paths. Routes go through entrances, so they can be a few cells
+    # longer than the exact BFS ones; close to the target, where that would
+    # show, an exact BFS over the target's cluster and its neighbours is
+    # used.
+    uses_clusters = True
+
+    def __init__(self, grid, target, ignore_walls=False, clusters=None):
+        self.width = len(grid[0])
+        self.height = len(grid)
+        self.target = target
+        self.ignore_walls = ignore_walls
+        self.distances = None
+        self.clusters = clusters if clusters is not None else ClusterGraph(grid)
+        self._restart()
+
+    def _restart(self):
+        graph = self.clusters
+        self.version = graph.version
+        # Entrance -> distance to the target, for settled and for reached
+        # but unsettled entrances; the heap holds the latter keyed by
+        # distance + estimate to the cluster the search is aimed at.
+        self.settled = {}
+        self.tentative = {}
+        self.heap = []
+        self.aim = None
+
+        target_x, target_y = self.target
+        size = graph.cluster_size
+        cluster_x, cluster_y = graph.cluster_key(target_x, target_y)
+        x0, y0 = max(0, (cluster_x - 1) * size), max(0, (cluster_y - 1) * size)
+        self.target_area = Cluster(x0, y0, min((cluster_x + 2) * size, self.width) - x0, min((cluster_y + 2) * size, self.height) - y0)
+        self.target_table = graph.local_distances(self.target_area, target_x, target_y)
+        for key_y in range(y0 // size, (y0 + self.target_area.height - 1) // size + 1):
+            for key_x in range(x0 // size, (x0 + self.target_area.width - 1) // size + 1):
+                for entrance in graph.cluster((key_x, key_y)).entrances:
+                    distance = self.target_table[self.target_area.local(*entrance)]
+                    if distance != UNREACHABLE:
+                        self.tentative[entrance] = distance
+
+    def _aim(self, cluster):
+        if cluster is self.aim:
+            return
+        self.aim = cluster
+        self.heap = [(distance + cluster.distance_to(*entrance), distance, entrance) for entrance, distance in self.tentative.items()]
+        heapq.heapify(self.heap)
+
+    def _expand(self):
+        # Settles the next entrance and returns it (None for a stale entry).
+        settled, tentative, heap = self.settled, self.tentative, self.heap
+        _, distance, entrance = heapq.heappop(heap)
+        if entrance in settled or tentative.get(entrance) != distance:
+            return None
+        settled[entrance] = tentative.pop(entrance)
+
+        graph, aim = self.clusters, self.aim
+        left, top = aim.x0, aim.y0
+        right, bottom = left + aim.width - 1, top + aim.height - 1
+        for other, weight in graph.edges(graph.cluster_at(*entrance), entrance):
+            other_distance = distance + weight
+            if other not in settled and other_distance < tentative.get(other, other_distance + 1):
+                tentative[other] = other_distance
+                x, y = other
+                # aim.distance_to(x, y), written out.
+                estimate = max(left - x, 0, x - right) + max(top - y, 0, y - bottom)
+                heapq.heappush(heap, (other_distance + estimate, other_distance, other))
+        return entrance
+
+    def _best(self, x, y):
+        # (distance, entrance) of the best route from (x, y), with None as
+        # the entrance when the route stays inside the target area. The
+        # search runs until no unsettled entrance could beat it, so the
+        # answer doesn't depend on what was asked before.
+        graph = self.clusters
+        if self.version != graph.version:
+            self._restart()
+        cluster = graph.cluster_at(x, y)
+        local = cluster.local(x, y)
+        # In-cluster distance from (x, y) to each entrance it can reach.
+        exits = {}
+        for entrance in cluster.entrances:
+            distance = graph.table(cluster, entrance)[local]
+            if distance != UNREACHABLE:
+                exits[entrance] = distance
+
+        best = None
+        area = self.target_area
+        if area.contains(x, y) and self.target_table[area.local(x, y)] != UNREACHABLE:
+            best = (self.target_table[area.local(x, y)], None)
+        if not exits:
+            return best
+
+        settled = self.settled
+        for entrance in cluster.entrances:
+            if entrance in exits and entrance in settled:
+                distance = exits[entrance] + settled[entrance]
+                if best is None or distance < best[0]:
+                    best = (distance, entrance)
+
+        self._aim(cluster)
+        heap = self.heap
+        while heap and (best is None or heap[0][0] <= best[0]):
+            entrance = self._expand()
+            if entrance in exits:
+                distance = exits[entrance] + settled[entrance]
+                if best is None or distance < best[0] or (distance == best[0] and best[1] is not None and cluster.entrances.index(entrance) < cluster.entrances.index(best[1])):
+                    best = (distance, entrance)
+        return best
+
+    def distance(self, x, y):
+        best = self._best(x, y)
+        return UNREACHABLE if best is None else best[0]
+
+    def next_step(self, x, y, steps=1):
+        graph = self.clusters
+        for _ in range(steps):
+            best = self._best(x, y)
+            if best is None or best[0] <= 0:
+                break
+            distance, entrance = best
+            if entrance == (x, y):
+                # On the entrance itself: its route continues across the
+                # border or to another entrance, so take the neighbour with
+                # the shortest remaining route (always at least one closer).
+                closest = None
+                for dx, dy in STEP_OFFSETS:
+                    nx, ny = x + dx, y + dy
+                    if 0 <= nx < self.width and 0 <= ny < self.height and graph.grid[ny][nx] == 1:
+                        neighbor_distance = self.distance(nx, ny)
+                        if neighbor_distance != UNREACHABLE and neighbor_distance < distance and (closest is None or neighbor_distance < closest[0]):
+                            closest = (neighbor_distance, nx, ny)
+                x, y = closest[1:]
+                continue
+
+            if entrance is None:
+                area, table = self.target_area, self.target_table
+            else:
+                area = graph.cluster_at(x, y)
+                table = graph.table(area, entrance)
+            current = table[area.local(x, y)]
+            for dx, dy in STEP_OFFSETS:
+                nx, ny = x + dx, y + dy
+                if area.contains(nx, ny) and table[area.local(nx, ny)] == current - 1:
+                    x, y = nx, ny
+                    break
+        return x, y
+
+    def open_cell(self, grid, x, y):
+        # The cache refreshes the shared ClusterGraph, and the version bump
+        # restarts the search on the next query.
+        pass
+
+    def close_cells(self, grid, cells):
+        pass
+
+def default_field_class(width, height, enemies=0):
+    if width * height >= HIERARCHICAL_MIN_CELLS and enemies <= HIERARCHICAL_MAX_ENEMIES:
+        return HierarchicalField
+    if numpy is not None and width * height >= ARRAY_BACKEND_MIN_CELLS:
+        return ArrayFlowField
+    return FlowField
+
+class FlowFieldCache:
+    # Wall-respecting fields keyed by target cell. Wall breaks and grid
+    # restores are repaired in place instead of dropping the cached fields,
+    # and only when a field is next used: until then each field collects
+    # the cells that changed under it, so a cell opened and closed again
+    # (a reset, a search backing out of a move) costs nothing.
+    def __init__(self, size=16, field_class=FlowField):
+        self.size = size
+        self.field_class = field_class
+        self.grid_array = None
+        self.clusters = None
+        # NextHopTable for the unchanged grid, when one was loaded.
+        self.next_hops = None
+        self.fields = OrderedDict()
+        # Target -> cells whose wall state flipped since its field was last
+        # repaired.
+        self.stale = {}
+        self.opened_cells = []
+        self.full_builds = 0
+        self.repairs = 0
+
+    def get(self, grid, target):
+        if self.next_hops is not None and not self.opened_cells:
+            field = self.next_hops.field(target)
+            if field is not None:
+                return field
+        field = self.fields.pop(target, None)
+        if field is not None and self.stale.get(target):
+            field = self._repair(grid, field, self.stale.pop(target))
+        if field is None:
+            if self.field_class.uses_clusters:
+                if self.clusters is None:
+                    self.clusters = ClusterGraph(grid)
+                field = self.field_class(grid, target, clusters=self.clusters)
+            elif self.field_class.uses_grid_array:
+                if self.grid_array is None:
+                    self.grid_array = grid_to_array(grid)
+                field = self.field_class(grid, target, grid_array=self.grid_array)
+            else:
+                field = self.field_class(grid, target)
+            self.full_builds += 1
+            if len(self.fields) >= self.size:
+                self.stale.pop(self.fields.popitem(last=False)[0], None)
+        self.fields[target] = field
+        return field
+
+    def open_cell(self, grid, x, y):
+        self.opened_cells.append((x, y))
+        if self.grid_array is not None:
+            self.grid_array[y, x] = grid[y][x]
+        if self.clusters is not None:
+            self.clusters.refresh(x, y)
+        self._flip([(x, y)])
+
+    def _flip(self, cells):
+        for target in self.fields:
+            stale = self.stale.get(target)
+            if stale is None:
+                stale = self.stale[target] = set()
+            stale.symmetric_difference_update(cells)
+
+    def _repair(self, grid, field, cells):
+        # Opens are relaxed and closes re-grown in place; a mix of both is
+        # rebuilt instead, since each repair assumes the other kind of
+        # change hasn't happened.
+        opened = [(x, y) for x, y in cells if grid[y][x] == 1]
+        if len(opened) == len(cells):
+            for x, y in opened:
+                field.open_cell(grid, x, y)
+        elif not opened:
+            field.close_cells(grid, list(cells))
+        else:
+            return None
+        self.repairs += 1
+        return field
+
+    def restore(self, grid):
+        # Opened cells that are walls again get closed; any still open (a
+        # restored snapshot can keep some) stay tracked.
+        closed = [(x, y) for x, y in self.opened_cells if grid[y][x] != 1]
+        self.opened_cells = [(x, y) for x, y in self.opened_cells if grid[y][x] == 1]
+        if self.grid_array is not None:
+            for x, y in closed:
+                self.grid_array[y, x] = grid[y][x]
+        if self.clusters is not None:
+            for x, y in closed:
+                self.clusters.refresh(x, y)
+        if closed:
+            self._flip(closed)
+        return closed
@@ -0,0 +1,76 @@
+import json
+import time
+from collections import deque
+
+# Per-phase frame timings. Code under measurement brackets a phase with
+#
+#     start = profiler.start()
+#     ...
+#     profiler.stop("phase", start)
+#
+# While the profiler is disabled start() returns None and stop() returns
+# straight away, so the instrumentation costs two calls per phase.
+
+class FrameProfiler:
+    def __init__(self, window=300, max_trace_events=1000000):
+        self.enabled = False
+        self.window = window
+        self.max_trace_events = max_trace_events
+        # Phase name -> the last `window` durations, in seconds.
+        self.samples = {}
+        # (name, start, duration) for every measured phase while tracing.
+        self.trace = None
+        self.origin = time.perf_counter()
+
+    def start(self):
+        if self.enabled:
+            return time.perf_counter()
+        return None
+
+    def stop(self, name, start):
+        if start is None:
+            return
+        duration = time.perf_counter() - start
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = deque(maxlen=self.window)
+        samples.append(duration)
+        if self.trace is not None:
+            self.trace.append((name, start, duration))
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        # Tracing keeps the profiler running until the trace is exported.
+        if self.trace is None:
+            self.enabled = False
+
+    def start_trace(self):
+        self.trace = deque(maxlen=self.max_trace_events)
+        self.enabled = True
+
+    def percentiles(self):
+        # (phase, p50 ms, p99 ms, samples) over the rolling window.
+        rows = []
+        for name, samples in self.samples.items():
+            ordered = sorted(samples)
+            count = len(ordered)
+            rows.append((name, ordered[count // 2] * 1000, ordered[min(count - 1, count * 99 // 100)] * 1000, count))
+        return rows
+
+    def trace_events(self):
+        # Chrome trace "complete" events, in microseconds since start-up.
+        return [
+            {"name": name, "ph": "X", "ts": (start - self.origin) * 1e6, "dur": duration * 1e6, "pid": 1, "tid": 1}
+            for name, start, duration in self.trace or ()
+        ]
+
+    def export(self, path):
+        # Loads in chrome://tracing and Perfetto; the percentile summary rides
+        # along under otherData.
+        summary = {name: {"p50_ms": p50, "p99_ms": p99, "samples": count} for name, p50, p99, count in self.percentiles()}
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms", "otherData": {"percentiles": summary}}, file)
+
+profiler = FrameProfiler()
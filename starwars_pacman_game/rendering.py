@@ -0,0 +1,163 @@
+import os
+from collections import OrderedDict
+
+import pygame
+
+class DirtyRectRenderer:
+    # Draws a frame as a pre-rendered background plus a list of
+    # (surface, position) items, and only pushes the rectangles that
+    # changed since the previous frame to the display.
+    def __init__(self, screen, background):
+        self.screen = screen
+        self.background = background
+        self.previous_items = []
+        self.previous_rects = []
+        self.patched_rects = []
+        self.full_redraw = True
+        # Blits issued for the last drawn frame, and totals since creation.
+        self.last_blits = 0
+        self.frames = 0
+        self.blits = 0
+
+    def patch(self, rect):
+        self.patched_rects.append(pygame.Rect(rect))
+
+    def invalidate(self):
+        self.full_redraw = True
+
+    def render(self, items):
+        if not self.full_redraw and not self.patched_rects and items == self.previous_items:
+            return
+
+        if self.full_redraw:
+            self.screen.blit(self.background, (0, 0))
+            restored = 1
+        else:
+            restore_rects = self.previous_rects + self.patched_rects
+            self.screen.blits([(self.background, rect, rect) for rect in restore_rects], doreturn=False)
+            restored = len(restore_rects)
+
+        # One call for the whole sprite list; the returned rects are already
+        # clipped to the screen.
+        rects = self.screen.blits(items)
+
+        if self.full_redraw:
+            pygame.display.update()
+        else:
+            pygame.display.update(self.previous_rects + self.patched_rects + rects)
+
+        self.last_blits = restored + len(items)
+        self.frames += 1
+        self.blits += self.last_blits
+        self.previous_items = items
+        self.previous_rects = rects
+        self.patched_rects = []
+        self.full_redraw = False
+
+class ChunkCache:
+    # Square pieces of the map background, rendered the first time they come
+    # into view and kept (up to max_chunks) so scrolling only blits them.
+    def __init__(self, render_chunk, chunk_size, max_chunks=96):
+        self.render_chunk = render_chunk
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        self.chunks = OrderedDict()
+        self.rendered = 0
+
+    def get(self, chunk_x, chunk_y):
+        key = (chunk_x, chunk_y)
+        surface = self.chunks.pop(key, None)
+        if surface is None:
+            surface = pygame.Surface((self.chunk_size, self.chunk_size)).convert()
+            self.render_chunk(surface, chunk_x, chunk_y)
+            self.rendered += 1
+            if len(self.chunks) >= self.max_chunks:
+                self.chunks.popitem(last=False)
+        self.chunks[key] = surface
+        return surface
+
+    def cached(self, chunk_x, chunk_y):
+        return self.chunks.get((chunk_x, chunk_y))
+
+class AssetManager:
+    # Images are loaded and converted to the display format once, and every
+    # (image, size, angle) variant is scaled and rotated once. pack() copies
+    # a set of variants into a single atlas surface, so the sprites drawn
+    # every frame share one block of memory in the display's pixel format.
+    # Needs the display mode to be set before the first lookup.
+    ATLAS_WIDTH = 1024
+
+    def __init__(self, assets_path):
+        self.assets_path = assets_path
+        self.images = {}
+        self.variants = {}
+        self.atlas = None
+
+    def image(self, name):
+        image = self.images.get(name)
+        if image is None:
+            image = pygame.image.load(os.path.join(self.assets_path, name)).convert_alpha()
+            self.images[name] = image
+        return image
+
+    def sprite(self, name, size, angle=0):
+        key = (name, tuple(size), angle)
+        surface = self.variants.get(key)
+        if surface is None:
+            surface = pygame.transform.scale(self.image(name), size)
+            if angle:
+                surface = pygame.transform.rotate(surface, angle)
+            self.variants[key] = surface
+        return surface
+
+    def pack(self, keys):
+        # Shelf packing: left to right, starting a new row when one fills.
+        surfaces = [self.sprite(*key) for key in keys]
+        positions = []
+        x = y = shelf_height = 0
+        for surface in surfaces:
+            width, height = surface.get_size()
+            if x and x + width > self.ATLAS_WIDTH:
+                x, y, shelf_height = 0, y + shelf_height, 0
+            positions.append((x, y))
+            x += width
+            shelf_height = max(shelf_height, height)
+
+        self.atlas = pygame.Surface((self.ATLAS_WIDTH, y + shelf_height), pygame.SRCALPHA).convert_alpha()
+        self.atlas.fill((0, 0, 0, 0))
+        for key, surface, position in zip(keys, surfaces, positions):
+            # RGBA_MAX onto a cleared atlas copies the pixels exactly, alpha
+            # included, where a normal alpha blit would blend them.
+            self.atlas.blit(surface, position, special_flags=pygame.BLEND_RGBA_MAX)
+            self.variants[(key[0], tuple(key[1]), key[2])] = self.atlas.subsurface(pygame.Rect(position, surface.get_size()))
+        return self.atlas
+
+class TextCache:
+    # Fonts and rendered strings keyed by (font, size, text, colour). The
+    # game only ever draws a handful of distinct strings, so after the first
+    # frame every lookup should be a hit.
+    def __init__(self):
+        self.fonts = {}
+        self.surfaces = {}
+        self.hits = 0
+        self.misses = 0
+
+    def font(self, font_name, size):
+        font = self.fonts.get((font_name, size))
+        if font is None:
+            font = pygame.font.Font(font_name, size)
+            self.fonts[(font_name, size)] = font
+        return font
+
+    def render(self, font_name, size, text, color):
+        key = (font_name, size, text, color)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            self.misses += 1
+            surface = self.font(font_name, size).render(text, True, color)
+            self.surfaces[key] = surface
+        else:
+            self.hits += 1
+        return surface
+
+text_cache = TextCache()
@@ -0,0 +1,187 @@
+import argparse
+import json
+import os
+import struct
+import time
+
+from engine import DIRECTIONS, PLAYING, STATUSES, GameState
+
+# Input recordings: the map hash, the character picked for each game and
+# every accepted move, 2 bits per move. The rules are deterministic, so
+# replaying the moves reproduces every enemy step, Vader wall break and
+# collision reset exactly; each game also stores how it ended so a replay
+# can be checked against it.
+#
+# Layout (little-endian):
+#   header: magic, version, seed, config SHA-256, game count
+#   game:   character, move count, outcome status, health x2, turns,
+#           then the moves packed four to a byte
+
+MAGIC = b"SWREC"
+# Version 2: enemies break path ties the way the original game did.
+FORMAT_VERSION = 2
+HEADER = struct.Struct("<5sBQ32sI")
+GAME = struct.Struct("<BIBBI")
+
+CHARACTERS = ("yoda", "luke")
+MOVE_CODES = {direction: code for code, direction in enumerate(DIRECTIONS)}
+
+def character_name(state, character):
+    return "yoda" if character is state.master_yoda else "luke"
+
+def select(state, name):
+    state.select_character(state.master_yoda if name == "yoda" else state.luke_skywalker)
+
+def pack_moves(moves):
+    packed = bytearray((len(moves) + 3) // 4)
+    for i, move in enumerate(moves):
+        packed[i >> 2] |= MOVE_CODES[move] << ((i & 3) * 2)
+    return bytes(packed)
+
+def unpack_moves(data, count):
+    return [DIRECTIONS[(data[i >> 2] >> ((i & 3) * 2)) & 3] for i in range(count)]
+
+class Outcome:
+    def __init__(self, status=PLAYING, health=0, turns=0):
+        self.status = status
+        self.health = health
+        self.turns = turns
+
+    @classmethod
+    def of(cls, state):
+        return cls(state.status, state.selected_character.get_health(), state.turns)
+
+    def __eq__(self, other):
+        return (self.status, self.health, self.turns) == (other.status, other.health, other.turns)
+
+    def as_dict(self):
+        return {"status": self.status, "health": self.health, "turns": self.turns}
+
+class RecordedGame:
+    def __init__(self, character, moves=None, outcome=None):
+        self.character = character
+        self.moves = moves if moves is not None else []
+        self.outcome = outcome or Outcome()
+
+class Recording:
+    def __init__(self, config_hash, seed=0):
+        self.config_hash = config_hash
+        # Not used by the rules themselves, which have no randomness; kept
+        # for tools whose players draw moves from a seeded RNG.
+        self.seed = seed
+        self.games = []
+
+    def start_game(self, character):
+        self.games.append(RecordedGame(character))
+
+    def record(self, move):
+        self.games[-1].moves.append(move)
+
+    def finish_game(self, state):
+        if self.games:
+            self.games[-1].outcome = Outcome.of(state)
+
+    def to_bytes(self):
+        parts = [HEADER.pack(MAGIC, FORMAT_VERSION, self.seed, bytes.fromhex(self.config_hash), len(self.games))]
+        for game in self.games:
+            outcome = game.outcome
+            parts.append(GAME.pack(
+                CHARACTERS.index(game.character), len(game.moves),
+                STATUSES.index(outcome.status), int(outcome.health * 2), outcome.turns,
+            ))
+            parts.append(pack_moves(game.moves))
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) < HEADER.size:
+            raise ValueError("not a recording")
+        magic, version, seed, config_hash, game_count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"not a recording (version {FORMAT_VERSION})")
+        recording = cls(config_hash.hex(), seed)
+        offset = HEADER.size
+        for _ in range(game_count):
+            character, move_count, status, health, turns = GAME.unpack_from(data, offset)
+            offset += GAME.size
+            size = (move_count + 3) // 4
+            moves = unpack_moves(data[offset:offset + size], move_count)
+            offset += size
+            recording.games.append(RecordedGame(CHARACTERS[character], moves, Outcome(STATUSES[status], health / 2, turns)))
+        return recording
+
+    def save(self, path):
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(self.to_bytes())
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as file:
+            return cls.from_bytes(file.read())
+
+def check_map(recording, state):
+    if state.map_hash is not None and state.map_hash != recording.config_hash:
+        raise ValueError("the recording was made on a different config.txt")
+
+def replay(recording, state):
+    # Runs every recorded game through the rules as fast as possible and
+    # returns (recorded outcome, replayed outcome) per game.
+    check_map(recording, state)
+    outcomes = []
+    for game in recording.games:
+        state.reset()
+        select(state, game.character)
+        for move in game.moves:
+            state.step(move)
+        outcomes.append((game.outcome, Outcome.of(state)))
+    return outcomes
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded game headlessly and check it ends the way it did when recorded.")
+    parser.add_argument("recording")
+    parser.add_argument("--config", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.txt"))
+    parser.add_argument("--render", action="store_true", help="play the recording back in the game window instead")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    try:
+        recording = Recording.load(args.recording)
+        state = GameState.from_config(args.config)
+        check_map(recording, state)
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+    if args.render:
+        import game
+        game.play_recording(recording, state)
+        return
+
+    start = time.perf_counter()
+    outcomes = replay(recording, state)
+    elapsed = time.perf_counter() - start
+
+    moves = sum(len(recorded_game.moves) for recorded_game in recording.games)
+    report = {
+        "games": [
+            {"character": recorded_game.character, "moves": len(recorded_game.moves), "recorded": recorded.as_dict(), "replayed": replayed.as_dict(), "match": recorded == replayed}
+            for recorded_game, (recorded, replayed) in zip(recording.games, outcomes)
+        ],
+        "moves": moves,
+        "elapsed_ms": elapsed * 1000,
+        "match": all(recorded == replayed for recorded, replayed in outcomes),
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for i, entry in enumerate(report["games"]):
+            print(f"game {i + 1}: {entry['character']:<5} {entry['moves']:>6} moves  "
+                  f"recorded {entry['recorded']['status']}/{entry['recorded']['health']}/{entry['recorded']['turns']}  "
+                  f"replayed {entry['replayed']['status']}/{entry['replayed']['health']}/{entry['replayed']['turns']}  "
+                  f"{'ok' if entry['match'] else 'MISMATCH'}")
+        print(f"{moves} moves replayed in {report['elapsed_ms']:.1f} ms")
+    if not report["match"]:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
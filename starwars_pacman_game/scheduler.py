@@ -0,0 +1,83 @@
+import heapq
+import itertools
+
+class Scheduler:
+    # Delayed callbacks for a frame-driven loop. The loop calls update() once
+    # per frame with the current time, and anything whose delay has passed
+    # runs then, so pauses and screen transitions never block event
+    # handling. Times are in milliseconds.
+    def __init__(self):
+        self.now = 0
+        self.tasks = []
+        self.cancelled = set()
+        self.counter = itertools.count()
+
+    def after(self, delay, callback):
+        task_id = next(self.counter)
+        heapq.heappush(self.tasks, (self.now + delay, task_id, callback))
+        return task_id
+
+    def cancel(self, task_id):
+        self.cancelled.add(task_id)
+
+    def clear(self):
+        self.tasks = []
+        self.cancelled = set()
+
+    def pending(self):
+        return len(self.tasks) - len(self.cancelled)
+
+    def next_due(self):
+        # When the earliest live task is due, or None if nothing is waiting.
+        while self.tasks and self.tasks[0][1] in self.cancelled:
+            self.cancelled.discard(heapq.heappop(self.tasks)[1])
+        return self.tasks[0][0] if self.tasks else None
+
+    def update(self, now):
+        # Tasks scheduled by a callback are measured from this update's time
+        # and run in this same call if they are already due.
+        self.now = now
+        while self.tasks and self.tasks[0][0] <= now:
+            _, task_id, callback = heapq.heappop(self.tasks)
+            if task_id in self.cancelled:
+                self.cancelled.discard(task_id)
+                continue
+            callback()
+
+class FixedTimestep:
+    # Turns real time into a whole number of simulation ticks. The loop
+    # calls advance() once per frame with the current time and runs that
+    # many ticks, so the tick rate doesn't depend on the frame rate: time
+    # lost to a slow frame is made up on the next one, up to max_catch_up
+    # ticks. Times are in milliseconds.
+    def __init__(self, tick_ms, max_catch_up=8):
+        self.tick_ms = tick_ms
+        self.max_catch_up = max_catch_up
+        self.next_tick = None
+        self.resting = False
+
+    def advance(self, now):
+        if self.next_tick is None:
+            self.next_tick = now
+        elif self.resting:
+            self.next_tick = max(self.next_tick, now)
+        self.resting = False
+        ticks = 0
+        while self.next_tick <= now and ticks < self.max_catch_up:
+            self.next_tick += self.tick_ms
+            ticks += 1
+        if self.next_tick <= now:
+            # Too far behind to catch up; drop the rest.
+            self.next_tick = now + self.tick_ms
+        return ticks
+
+    def rest(self):
+        # Nothing needs ticks until further notice, so the time until the
+        # next advance() isn't banked; the next tick still keeps its spacing
+        # from the last one.
+        self.resting = True
+
+    def until_next(self, now):
+        if self.next_tick is None:
+            return 0
+        return max(0, self.next_tick - now)
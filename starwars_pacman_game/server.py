@@ -0,0 +1,178 @@
+import argparse
+import asyncio
+import os
+import struct
+import sys
+import tempfile
+import time
+
+from engine import DIRECTIONS, GameState
+from mapfile import load_map_data
+from nexthop import load_table
+from replay import CHARACTERS, STATUSES, select
+
+# Hosts many independent games in one process. Every connection on the
+# local socket is a session with its own GameState (grid, characters and
+# enemies). The rules never block, so one asyncio loop serves them all.
+# Moves arrive as two-byte commands. Each reply is a length-prefixed
+# frame: the full state when a game starts, then only what changed after
+# each move.
+#
+# Commands (client -> server), two bytes: command, argument
+#   START  character (0 = yoda, 1 = luke); starts or restarts the game
+#   MOVE   direction, 0-3 in DIRECTIONS order
+#   STATS  ignored; asks for the server-wide counters
+#
+# Frames (server -> client), uint32 length then (little-endian):
+#   STATE  kind, width, height, player x/y, health x2, status, turns,
+#          enemy count, the grid one byte per cell, kind/x/y per enemy
+#   DELTA  kind, player x/y, health x2, status, flags, turns, changed
+#          cell count, moved enemy count, x/y/value per cell, id/x/y per
+#          enemy
+#   STATS  kind, sessions, turns, seconds in turn logic, process CPU seconds
+
+START = 1
+MOVE = 2
+STATS = 3
+
+STATE_FRAME = 1
+DELTA_FRAME = 2
+STATS_FRAME = 3
+
+# Set in DELTA flags when an enemy caught the player this turn.
+HIT = 1
+
+COMMAND = struct.Struct("<BB")
+LENGTH = struct.Struct("<I")
+STATE_HEADER = struct.Struct("<BHHHHBBIH")
+ENEMY_STATE = struct.Struct("<BHH")
+DELTA_HEADER = struct.Struct("<BHHBBBIHH")
+CELL = struct.Struct("<HHB")
+ENEMY_MOVE = struct.Struct("<IHH")
+STATS_HEADER = struct.Struct("<BIQdd")
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), "swpacman.sock")
+# Load tests open hundreds of sessions at once.
+LISTEN_BACKLOG = 1024
+
+class ProtocolError(ValueError):
+    pass
+
+class Session:
+    def __init__(self, map_data, next_hops=None):
+        self.state = GameState.from_map_data(map_data, next_hops)
+        # Enemy positions as last sent, to find the ones that moved.
+        self.sent_x = self.state.entities.x[:]
+        self.sent_y = self.state.entities.y[:]
+
+    def start(self, character):
+        if character >= len(CHARACTERS):
+            raise ProtocolError(f"unknown character {character}")
+        state = self.state
+        state.reset()
+        select(state, CHARACTERS[character])
+        entities = state.entities
+        self.sent_x[:] = entities.x
+        self.sent_y[:] = entities.y
+
+        player = state.selected_character
+        parts = [
+            STATE_HEADER.pack(
+                STATE_FRAME, state.width, state.height, *player.get_position(),
+                int(player.get_health() * 2), STATUSES.index(state.status), state.turns, len(entities),
+            ),
+            b"".join(bytes(row) for row in state.grid),
+        ]
+        parts += [ENEMY_STATE.pack(kind, x, y) for kind, x, y in zip(entities.kind, entities.x, entities.y)]
+        return b"".join(parts)
+
+    def move(self, direction):
+        state = self.state
+        if state.selected_character is None:
+            raise ProtocolError("MOVE before START")
+        if direction >= len(DIRECTIONS):
+            raise ProtocolError(f"unknown direction {direction}")
+        result = state.step(DIRECTIONS[direction])
+
+        grid = state.grid
+        cells = [CELL.pack(x, y, grid[y][x]) for x, y in result.opened_cells + result.restored_cells]
+        xs, ys, sent_x, sent_y = state.entities.x, state.entities.y, self.sent_x, self.sent_y
+        moved = []
+        for enemy_id in range(len(xs)):
+            if xs[enemy_id] != sent_x[enemy_id] or ys[enemy_id] != sent_y[enemy_id]:
+                moved.append(ENEMY_MOVE.pack(enemy_id, xs[enemy_id], ys[enemy_id]))
+        sent_x[:] = xs
+        sent_y[:] = ys
+
+        player = state.selected_character
+        header = DELTA_HEADER.pack(
+            DELTA_FRAME, *player.get_position(), int(player.get_health() * 2),
+            STATUSES.index(state.status), HIT if result.hit else 0, state.turns, len(cells), len(moved),
+        )
+        return b"".join([header, *cells, *moved])
+
+class GameServer:
+    def __init__(self, map_data, next_hops=None):
+        self.map_data = map_data
+        self.next_hops = next_hops
+        self.sessions = 0
+        self.turns = 0
+        self.turn_seconds = 0.0
+
+    def stats(self):
+        return STATS_HEADER.pack(STATS_FRAME, self.sessions, self.turns, self.turn_seconds, time.process_time())
+
+    async def handle(self, reader, writer):
+        session = Session(self.map_data, self.next_hops)
+        self.sessions += 1
+        try:
+            while True:
+                command, argument = COMMAND.unpack(await reader.readexactly(COMMAND.size))
+                if command == MOVE:
+                    # CPU time, so clients sharing the machine don't count.
+                    start = time.process_time()
+                    frame = session.move(argument)
+                    self.turn_seconds += time.process_time() - start
+                    self.turns += 1
+                elif command == START:
+                    frame = session.start(argument)
+                elif command == STATS:
+                    frame = self.stats()
+                else:
+                    raise ProtocolError(f"unknown command {command}")
+                writer.write(LENGTH.pack(len(frame)) + frame)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ProtocolError):
+            pass
+        finally:
+            self.sessions -= 1
+            writer.close()
+
+async def serve(game_server, unix_path=None, port=None):
+    if port is not None:
+        listener = await asyncio.start_server(game_server.handle, "127.0.0.1", port, backlog=LISTEN_BACKLOG)
+    else:
+        if os.path.exists(unix_path):
+            os.remove(unix_path)
+        listener = await asyncio.start_unix_server(game_server.handle, unix_path, backlog=LISTEN_BACKLOG)
+    async with listener:
+        await listener.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Host many headless game sessions over a local socket.")
+    parser.add_argument("--config", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.txt"))
+    parser.add_argument("--unix", default=DEFAULT_SOCKET, metavar="PATH", help="Unix socket to listen on")
+    parser.add_argument("--port", type=int, help="listen on 127.0.0.1:PORT instead (the only option on Windows)")
+    args = parser.parse_args()
+    if args.port is None and sys.platform == "win32":
+        parser.error("--port is required on Windows")
+
+    map_data = load_map_data(args.config)
+    game_server = GameServer(map_data, load_table(args.config, map_data.digest))
+    try:
+        asyncio.run(serve(game_server, args.unix, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import os
+import struct
+import sys
+from array import array
+
+# Packed game states. The grid is one byte per cell, row by row (the same
+# layout mapfile.py compiles maps to), enemy positions are copies of the
+# entity arrays, and both players, the selected character, the status and
+# the turn count sit in a fixed header. Taking or restoring one is a few
+# bulk copies rather than a deep copy of grid rows and Location objects,
+# so it is cheap enough to branch a game from, and the same bytes are the
+# save-game format. Snapshots taken in memory hold the grid as the list of
+# walls broken since the original grid and only pack it when saved.
+#
+# Layout (little-endian):
+#   header:  magic, version, config SHA-256, width, height, enemy count,
+#            selected character (0 none, 1 Yoda, 2 Luke), status, turns,
+#            then x, y, health x2 for Yoda and for Luke
+#   grid:    width * height bytes
+#   enemies: every x, then every y, int32 each
+
+MAGIC = b"SWSAV"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<5sB32sIIIBBIIIBIIB")
+
+NO_CHARACTER = 0
+YODA = 1
+LUKE = 2
+
+def little_endian(values):
+    # The int32 array as stored in a save: swapped on big-endian hosts,
+    # which also turns stored bytes back into values there.
+    if sys.byteorder == "big":
+        values = values[:]
+        values.byteswap()
+    return values
+
+def pack_grid(grid):
+    return b"".join(bytes(row) for row in grid)
+
+def broken_walls_in(original_cells, cells, width):
+    # The cells that are walls in the original grid and open in cells. Walls
+    # only ever break, so any other difference can't come from this map.
+    walls = []
+    for offset in range(0, len(cells), width):
+        row = cells[offset:offset + width]
+        original_row = original_cells[offset:offset + width]
+        if row == original_row:
+            continue
+        for x, (value, original_value) in enumerate(zip(row, original_row)):
+            if value != original_value:
+                if original_value != 0 or value != 1:
+                    raise ValueError("the snapshot's grid doesn't come from this map")
+                walls.append((x, offset // width))
+    return walls
+
+class Snapshot:
+    def __init__(self, map_hash, width, height, cells, enemy_x, enemy_y, players, selected, status, turns, broken_walls=None, original_grid=None):
+        self.map_hash = map_hash
+        self.width = width
+        self.height = height
+        # Either the packed grid, or the walls broken since original_grid
+        # (whose rows are never written to), packed on demand.
+        self.cells = cells
+        self.broken_walls = broken_walls
+        self.original_grid = original_grid
+        self.enemy_x = enemy_x
+        self.enemy_y = enemy_y
+        # (x, y, health) for Yoda, then for Luke.
+        self.players = players
+        self.selected = selected
+        # Index into engine.STATUSES.
+        self.status = status
+        self.turns = turns
+
+    def packed_cells(self):
+        if self.cells is None:
+            cells = bytearray(pack_grid(self.original_grid))
+            for x, y in self.broken_walls:
+                cells[y * self.width + x] = 1
+            self.cells = bytes(cells)
+        return self.cells
+
+    def to_bytes(self):
+        (yoda_x, yoda_y, yoda_health), (luke_x, luke_y, luke_health) = self.players
+        header = HEADER.pack(
+            MAGIC, FORMAT_VERSION, bytes.fromhex(self.map_hash) if self.map_hash else bytes(32),
+            self.width, self.height, len(self.enemy_x), self.selected, self.status, self.turns,
+            yoda_x, yoda_y, int(yoda_health * 2), luke_x, luke_y, int(luke_health * 2),
+        )
+        return b"".join((header, self.packed_cells(), little_endian(self.enemy_x).tobytes(), little_endian(self.enemy_y).tobytes()))
+
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) < HEADER.size:
+            raise ValueError("not a saved game")
+        (magic, version, map_hash, width, height, enemy_count, selected, status, turns,
+         yoda_x, yoda_y, yoda_health, luke_x, luke_y, luke_health) = HEADER.unpack_from(data)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"not a saved game (version {FORMAT_VERSION})")
+        offset = HEADER.size
+        cells = bytes(data[offset:offset + width * height])
+        offset += width * height
+        enemy_x, enemy_y = array("i"), array("i")
+        enemy_x.frombytes(data[offset:offset + enemy_count * enemy_x.itemsize])
+        offset += enemy_count * enemy_x.itemsize
+        enemy_y.frombytes(data[offset:offset + enemy_count * enemy_y.itemsize])
+        if len(cells) != width * height or len(enemy_x) != enemy_count or len(enemy_y) != enemy_count:
+            raise ValueError("the saved game is truncated")
+        enemy_x, enemy_y = little_endian(enemy_x), little_endian(enemy_y)
+        if selected > LUKE:
+            raise ValueError(f"unknown character {selected}")
+        players = ((yoda_x, yoda_y, yoda_health / 2), (luke_x, luke_y, luke_health / 2))
+        map_hash = map_hash.hex() if any(map_hash) else None
+        return cls(map_hash, width, height, cells, enemy_x, enemy_y, players, selected, status, turns)
+
+    def save(self, path):
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(self.to_bytes())
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as file:
+            return cls.from_bytes(file.read())